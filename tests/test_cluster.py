@@ -0,0 +1,91 @@
+# tests/test_cluster.py
+import time
+import uuid
+import zlib
+
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO
+from socketio.packet import Packet
+
+from util import cluster
+
+URLS = ['http://w0:8081', 'http://w1:8082', 'http://w2:8083']
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    monkeypatch.setattr(cluster, 'WORKER_URLS', list(URLS))
+    monkeypatch.setattr(cluster, 'WORKER_ID', 1)
+
+
+def test_single_worker_owns_everything(monkeypatch):
+    monkeypatch.setattr(cluster, 'WORKER_URLS', [])
+    assert cluster.worker_for_room('any') == 0
+    assert cluster.owns_room('any')
+    assert cluster.room_redirect('any', '/lobby/any') is None
+
+
+def test_pinning_is_stable_and_spread(workers):
+    rooms = [f'room-{i}' for i in range(3000)]
+    owners = [cluster.worker_for_room(r) for r in rooms]
+    # crc32 is the same in every process, unlike hash()
+    assert owners == [cluster.worker_for_room(r) for r in rooms]
+    assert cluster.worker_for_room('room-0') == zlib.crc32(b'room-0') % len(URLS)
+    counts = [owners.count(w) for w in range(len(URLS))]
+    assert all(800 < n < 1200 for n in counts), counts
+
+
+def test_owns_room_and_redirect(workers):
+    mine = next(r for r in (f'r{i}' for i in range(100)) if cluster.worker_for_room(r) == 1)
+    other = next(r for r in (f'r{i}' for i in range(100)) if cluster.worker_for_room(r) != 1)
+
+    assert cluster.owns_room(mine) and not cluster.owns_room(other)
+    assert cluster.room_redirect(mine, f'/lobby/{mine}') is None
+    owner_url = URLS[cluster.worker_for_room(other)]
+    assert cluster.room_redirect(other, f'/battlefield?room={other}') == \
+        f'{owner_url}/battlefield?room={other}'
+
+
+class _Worker:
+    """
+    One worker's Socket.IO server on <queue> with a single fake /lobby
+    connection.  The Flask-SocketIO test client refuses message queues,
+    so packets are caught where the server hands them to Engine.IO.
+    """
+
+    def __init__(self, queue):
+        self.socketio = SocketIO(Flask(__name__), async_mode='threading', message_queue=queue)
+        server = self.socketio.server
+        server.manager_initialized = True
+        server.manager.initialize()             # starts the queue listener
+        server.manager.connect('eio-test', '/lobby')
+        self.received = []
+        server._send_eio_packet = lambda eio_sid, pkt: self.received.append(
+            Packet(encoded_packet=pkt.data).data)
+        server._send_packet = lambda eio_sid, pkt: self.received.append(pkt.data)
+
+    def events(self, name, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not self._named(name):
+            time.sleep(0.02)
+        time.sleep(0.2)     # room for a duplicate delivery to show up
+        return self._named(name)
+
+    def _named(self, name):
+        return [data[1:] for data in self.received if data and data[0] == name]
+
+
+def test_lobby_broadcasts_reach_every_worker():
+    pytest.importorskip('kombu')
+    queue = f'memory://{uuid.uuid4().hex}'
+    a, b = _Worker(queue), _Worker(queue)
+    time.sleep(0.3)         # both listeners subscribed
+
+    a.socketio.emit('room_added', {'id': 'r1', 'name': 'r1'}, namespace='/lobby')
+    for worker in (a, b):
+        assert worker.events('room_added') == [[{'id': 'r1', 'name': 'r1'}]]
+
+    b.socketio.emit('leaderboard_updated', namespace='/lobby')
+    for worker in (a, b):
+        assert len(worker.events('leaderboard_updated')) == 1
@@ -0,0 +1,79 @@
+# tests/test_collision.py
+import random
+
+import pytest
+
+from util import collision
+from util.collision import CollisionMask, key_direction
+from util.terrain import Terrain
+
+STEP = 0.3
+
+
+def _moves(rng, width, height, n):
+    xs = [round(rng.uniform(0, width - 1), 2) for _ in range(n)]
+    ys = [round(rng.uniform(0, height - 1), 2) for _ in range(n)]
+    dxs = [rng.choice((-1, 0, 1)) for _ in range(n)]
+    dys = [rng.choice((-1, 0, 1)) for _ in range(n)]
+    codes = [rng.choice((0, 1, 2)) for _ in range(n)]
+    return xs, ys, dxs, dys, codes
+
+
+def _one_by_one(mask, xs, ys, dxs, dys, codes):
+    new_xs, new_ys, ok = [], [], []
+    for x, y, dx, dy, code in zip(xs, ys, dxs, dys, codes):
+        res = mask.resolve(x, y, dx, dy, code, STEP)
+        new_xs.append(x if res is None else res[0])
+        new_ys.append(y if res is None else res[1])
+        ok.append(res is not None)
+    return new_xs, new_ys, ok
+
+
+@pytest.mark.parametrize('width,height', [(30, 20), (70, 45), (33, 97)])
+def test_batch_matches_single_resolve(width, height):
+    rng = random.Random(width * height)
+    mask = CollisionMask(Terrain.generate(width, height, seed=7))
+    for n in (3, 400):      # below and above VECTORIZE_MIN
+        moves = _moves(rng, width, height, n)
+        assert mask.resolve_batch(*moves, STEP) == _one_by_one(mask, *moves)
+
+
+def test_batch_without_numpy(monkeypatch):
+    rng = random.Random(1)
+    mask = CollisionMask(Terrain.generate(64, 40, seed=3))
+    moves = _moves(rng, 64, 40, 200)
+    expected = mask.resolve_batch(*moves, STEP)
+    monkeypatch.setattr(collision, 'np', None)
+    assert mask.resolve_batch(*moves, STEP) == expected
+
+
+def test_rows_and_terrain_agree():
+    terrain = Terrain.generate(40, 36, seed=11)
+    from_terrain, from_rows = CollisionMask(terrain), CollisionMask(terrain.to_rows())
+    for y in range(terrain.height):
+        for x in range(terrain.width):
+            for code in (0, 1, 2):
+                assert from_terrain.blocked(code, x, y) == from_rows.blocked(code, x, y)
+
+
+def test_walls_and_safe_zones():
+    # red safe zone (3) top-left, blue safe zone (2) bottom-right, a wall in the middle
+    rows = [[3, 0, 0, 0],
+            [0, 0, 1, 0],
+            [0, 0, 0, 2]]
+    mask = CollisionMask(rows)
+    red, blue = collision.team_index('red'), collision.team_index('blue')
+    assert mask.blocked(red, 2, 1) and mask.blocked(blue, 2, 1)
+    assert mask.blocked(red, 3, 2) and not mask.blocked(red, 0, 0)
+    assert mask.blocked(blue, 0, 0) and not mask.blocked(blue, 3, 2)
+
+    assert mask.resolve(1.0, 1.0, 1, 0, red, STEP) == (1.0, 1.0)       # into the wall
+    assert mask.resolve(1.0, 1.0, 0, -1, red, STEP) == (1.0, 0.7)
+    assert mask.resolve(0.0, 0.0, -1, -1, red, STEP) is None           # off both edges
+    assert mask.resolve(0.0, 0.5, -1, 0, red, STEP) == (0.0, 0.5)      # clamped to the edge
+
+
+def test_key_direction():
+    assert key_direction({'ArrowRight': True, 'ArrowUp': True}) == (1, -1)
+    assert key_direction({'ArrowLeft': True, 'ArrowRight': True}) == (0, 0)
+    assert key_direction({}) == (0, 0)
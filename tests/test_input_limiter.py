@@ -0,0 +1,49 @@
+# tests/test_input_limiter.py
+from util import input_limiter
+from util.input_limiter import INPUT_BURST, INPUT_RATE, TokenBucket
+
+
+def test_bucket_allows_a_burst_then_drops():
+    bucket = TokenBucket(now=0.0)
+    assert all(bucket.take(0.0) for _ in range(int(INPUT_BURST)))
+    assert not bucket.take(0.0)
+
+
+def test_bucket_refills_at_the_input_rate():
+    bucket = TokenBucket(now=0.0)
+    while bucket.take(0.0):
+        pass
+    now = 1.0 / INPUT_RATE
+    assert bucket.take(now)
+    assert not bucket.take(now)
+
+
+def test_bucket_never_holds_more_than_a_burst():
+    bucket = TokenBucket(now=0.0)
+    taken = sum(bucket.take(3600.0) for _ in range(int(INPUT_BURST) * 3))
+    assert taken == int(INPUT_BURST)
+
+
+def test_steady_tick_rate_is_never_dropped():
+    # a client sending exactly at the tick rate stays below INPUT_RATE
+    bucket = TokenBucket(now=0.0)
+    interval = 1.25 / INPUT_RATE
+    assert all(bucket.take(i * interval) for i in range(1000))
+
+
+def test_allow_counts_and_forget(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(input_limiter.time, 'monotonic', lambda: clock[0])
+    before = dict(input_limiter.counters)
+    results = [input_limiter.allow('sid-limit') for _ in range(int(INPUT_BURST) + 2)]
+    assert results.count(True) == int(INPUT_BURST) and results[-2:] == [False, False]
+    assert input_limiter.counters['dropped'] - before['dropped'] == 2
+
+    # other connections have their own bucket
+    assert input_limiter.allow('sid-other')
+
+    # a forgotten sid starts over with a full bucket
+    input_limiter.forget('sid-limit')
+    assert input_limiter.allow('sid-limit')
+    input_limiter.forget('sid-limit')
+    input_limiter.forget('sid-other')
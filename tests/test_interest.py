@@ -0,0 +1,68 @@
+# tests/test_interest.py
+import pytest
+
+from util import interest
+from util.interest import AOI_CELL
+from util.room_state import RoomState
+
+FAR = AOI_CELL * 5
+
+
+@pytest.fixture
+def state():
+    players = [{'id': 'me', 'x': 1.0, 'y': 1.0, 'team': 'red'},
+               {'id': 'near', 'x': AOI_CELL + 1, 'y': 1.0, 'team': 'blue'},
+               {'id': 'far', 'x': FAR, 'y': FAR, 'team': 'blue'}]
+    yield RoomState({'id': 'aoi-room', 'players': players})
+    for sid in ('sid-me', 'sid-spec'):
+        interest.forget(sid)
+
+
+def _plan(state, updated, viewers):
+    return {sid: ([r.id for r in records], sorted(left))
+            for sid, _, records, left in interest.plan(state, updated, viewers)}
+
+
+def test_first_update_is_a_snapshot_of_the_block(state):
+    viewers = [('sid-me', 'json', 'me')]
+    out = _plan(state, [state.players['far']], viewers)
+    assert out == {'sid-me': (['me', 'near'], [])}
+
+
+def test_only_nearby_movers_afterwards(state):
+    viewers = [('sid-me', 'json', 'me')]
+    _plan(state, [], viewers)
+    assert _plan(state, [state.players['far']], viewers) == {}
+    assert _plan(state, [state.players['near']], viewers) == {'sid-me': (['near'], [])}
+
+
+def test_spectators_get_everything(state):
+    updated = [state.players['far'], state.players['near']]
+    out = _plan(state, updated, [('sid-spec', 'bin', None)])
+    assert out == {'sid-spec': (['far', 'near'], [])}
+
+
+def test_mover_leaving_the_block_is_reported_once(state):
+    viewers = [('sid-me', 'json', 'me')]
+    _plan(state, [], viewers)
+    near = state.players['near']
+    state.move_player(near, FAR, 1.0)
+    assert _plan(state, [near], viewers) == {'sid-me': ([], ['near'])}
+    assert _plan(state, [near], viewers) == {}
+
+
+def test_viewer_moving_away_reports_who_it_left(state):
+    viewers = [('sid-me', 'json', 'me')]
+    _plan(state, [], viewers)
+    me = state.players['me']
+    state.move_player(me, FAR - 1, FAR - 1)
+    assert _plan(state, [me], viewers) == {'sid-me': (['me', 'far'], ['near'])}
+
+
+def test_minimap_encoding(state):
+    state.players['far'].alive = False
+    assert interest.encode_minimap(state) == [
+        1, 1, 1,
+        int(AOI_CELL + 1), 1, 2,
+        int(FAR), int(FAR), 2 | 4,
+    ]
@@ -0,0 +1,112 @@
+# tests/test_match_log.py
+import os
+import random
+import time
+
+import pytest
+
+from tools import replay
+from util import match_log, simulation
+from util.bots import Bot
+from util.room_state import RoomState
+from util.terrain import Terrain
+
+RESPAWN_TICKS = 10
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(match_log, 'MATCH_LOG_ENABLED', True)
+    monkeypatch.setattr(match_log, 'MATCH_LOG_DIR', str(tmp_path))
+    return tmp_path
+
+
+def _play(state, rounds=2, ticks=150):
+    """A short bot match, recorded the way util/battlefield.py and util/rounds.py do."""
+    bots = {pid: Bot(random.Random(pid)) for pid in state.players}
+    respawn_at, tick = {}, 0
+    taggers = 'red'
+    for round_no in range(1, rounds + 1):
+        state.set_attacking_team(taggers)
+        match_log.record_taggers(state)
+        for _ in range(ticks):
+            tick += 1
+            everyone = list(state.players.values())
+            inputs = {p.id: [(tick, bots[p.id].keys(p, everyone, state.attacking_team))]
+                      for p in everyone if p.alive}
+            match_log.record_tick(state, inputs)
+            moved, _ = simulation.apply_inputs(state, inputs)
+            for record in moved.values():
+                hit = simulation.check_tag(state, record)
+                if hit:
+                    respawn_at[hit[0].id] = tick + RESPAWN_TICKS
+            due = [pid for pid, at in respawn_at.items() if at <= tick]
+            if due:
+                records = [simulation.respawn(state, pid) for pid in due]
+                match_log.record_respawns(state, records)
+                for pid in due:
+                    del respawn_at[pid]
+            if tick == 40:
+                match_log.record_leave(state, 'p5')
+                state.remove_player('p5')
+        counts = state.team_counts()
+        match_log.record_round_end(state, round_no,
+                                   simulation.round_winner(counts['red'], counts['blue']))
+        taggers = 'blue' if taggers == 'red' else 'red'
+
+
+def _room(seed=3):
+    terrain = Terrain.generate(24, 16, seed)
+    rng = random.Random(seed)
+    players = [{'id': f'p{i}', 'x': rng.randrange(4, 20), 'y': rng.randrange(4, 12),
+                'team': 'red' if i % 2 == 0 else 'blue'} for i in range(6)]
+    return RoomState({'id': f'log-room-{seed}', 'players': players, 'map': terrain.spec()})
+
+
+def test_replay_has_no_mismatches(log_dir):
+    state = _room()
+    path = match_log.begin(state)
+    _play(state)
+    match_log.close(state.id)
+
+    stats = replay.replay(list(match_log.read(path)))
+    assert stats['mismatches'] == []
+    assert stats['ticks'] == 300 and stats['leaves'] == 1
+    assert len(stats['rounds']) == 2
+    assert stats['tags'] > 0 and stats['respawns'] > 0
+
+
+def test_replay_catches_a_changed_rule(log_dir, monkeypatch):
+    state = _room()
+    path = match_log.begin(state)
+    _play(state)
+    match_log.close(state.id)
+
+    # pretend the rules changed: nobody can be tagged any more
+    monkeypatch.setattr(simulation, 'check_tag', lambda state, mover: None)
+    assert replay.replay(list(match_log.read(path)))['mismatches']
+
+
+@pytest.mark.skipif('MATCH_LOG' in os.environ, reason='MATCH_LOG set in the environment')
+def test_recording_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(match_log, 'MATCH_LOG_DIR', str(tmp_path))
+    assert match_log.MATCH_LOG_ENABLED is False
+    assert match_log.begin(_room()) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_keep_only_the_newest_logs(log_dir, monkeypatch):
+    monkeypatch.setattr(match_log, 'MATCH_LOG_KEEP', 2)
+    paths = []
+    for seed in range(4):
+        state = _room(seed)
+        paths.append(match_log.begin(state))
+        match_log.close(state.id)
+        time.sleep(0.01)        # distinct mtimes
+    assert sorted(p.name for p in log_dir.iterdir()) == sorted(
+        p.rsplit('/', 1)[-1] for p in paths[-2:])
+
+
+def test_key_bits_round_trip():
+    keys = {'ArrowUp': True, 'ArrowDown': False, 'ArrowLeft': True, 'ArrowRight': False}
+    assert match_log.decode_keys(match_log.encode_keys(keys)) == keys
@@ -0,0 +1,57 @@
+# tests/test_protocol.py
+import struct
+
+from util import protocol
+from util.room_state import PlayerRecord
+
+
+def _decode(frame: bytes):
+    """Read a frame back the way templates/battlefield.html does."""
+    kind, count = struct.unpack_from('<BH', frame)
+    entry = struct.Struct('<HIIB' if kind == protocol.KEYFRAME else '<HIII')
+    assert len(frame) == 3 + count * entry.size
+    return kind, [(idx, x / 100, y / 100, last) for idx, x, y, last
+                  in entry.iter_unpack(frame[3:])]
+
+
+def _players():
+    alice = PlayerRecord('alice', 0, 1.25, 2.5, 'red')
+    bob = PlayerRecord('bob', 1, 29.0, 19.99, 'blue')
+    bob.alive = False
+    bob.last_seq = 70000
+    carol = PlayerRecord('carol', 513, 0.0, 0.3, None)
+    return [alice, bob, carol]
+
+
+def test_keyframe_round_trip():
+    kind, entries = _decode(protocol.encode_keyframe(_players()))
+    assert kind == protocol.KEYFRAME
+    assert entries == [(0, 1.25, 2.5, 1),
+                       (1, 29.0, 19.99, 2 | protocol.FLAG_DEAD),
+                       (513, 0.0, 0.3, 0)]
+
+
+def test_delta_round_trip():
+    kind, entries = _decode(protocol.encode_delta(_players()))
+    assert kind == protocol.DELTA
+    assert entries == [(0, 1.25, 2.5, 0), (1, 29.0, 19.99, 70000), (513, 0.0, 0.3, 0)]
+
+
+def test_empty_frames():
+    assert _decode(protocol.encode_keyframe([])) == (protocol.KEYFRAME, [])
+    assert _decode(protocol.encode_delta([])) == (protocol.DELTA, [])
+
+
+def test_viewers_follow_subscriptions():
+    protocol.subscribe('sid-a', 'room-p', protocol.FORMAT_BIN, 'alice')
+    protocol.subscribe('sid-b', 'room-p', protocol.FORMAT_JSON)
+    try:
+        assert protocol.format_of('sid-a') == protocol.FORMAT_BIN
+        assert protocol.has_subscribers('room-p', protocol.FORMAT_JSON)
+        assert sorted(protocol.viewers('room-p')) == [('sid-a', 'bin', 'alice'),
+                                                      ('sid-b', 'json', None)]
+    finally:
+        protocol.unsubscribe('sid-a')
+        protocol.unsubscribe('sid-b')
+    assert not protocol.has_subscribers('room-p', protocol.FORMAT_BIN)
+    assert protocol.viewers('room-p') == []
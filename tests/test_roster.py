@@ -0,0 +1,60 @@
+# tests/test_roster.py
+import mongomock
+import pytest
+
+from util import roster
+
+
+@pytest.fixture
+def rooms():
+    coll = mongomock.MongoClient().db.rooms
+    coll.insert_one({'id': 'r1', 'owner': 'alice', 'red_team': [], 'blue_team': [],
+                     'no_team': []})
+    return coll
+
+
+def test_set_team_moves_between_lists(rooms):
+    roster.ensure_member(rooms, 'r1', 'alice')
+    roster.ensure_member(rooms, 'r1', 'bob')
+
+    r = roster.set_team(rooms, 'r1', 'alice', 'red')
+    assert (r.red_list, r.blue_list, r.none_list) == (['alice'], [], ['bob'])
+    assert r.team_of('alice') == 'red' and r.team_of('bob') is None
+
+    r = roster.set_team(rooms, 'r1', 'alice', 'blue')
+    assert (r.red_list, r.blue_list, r.none_list) == ([], ['alice'], ['bob'])
+
+    r = roster.set_team(rooms, 'r1', 'alice', None)
+    assert (r.red_list, r.blue_list, r.none_list) == ([], [], ['bob', 'alice'])
+
+
+def test_set_team_is_idempotent(rooms):
+    roster.set_team(rooms, 'r1', 'alice', 'red')
+    r = roster.set_team(rooms, 'r1', 'alice', 'red')
+    assert r.red_list == ['alice']
+    assert rooms.find_one({'id': 'r1'})['red_team'] == ['alice']
+
+
+def test_set_team_unknown_team_means_no_team(rooms):
+    r = roster.set_team(rooms, 'r1', 'alice', 'green')
+    assert r.none_list == ['alice'] and 'alice' in r
+
+
+def test_set_team_missing_room(rooms):
+    assert roster.set_team(rooms, 'nope', 'alice', 'red') is None
+
+
+def test_ensure_member_keeps_team(rooms):
+    roster.set_team(rooms, 'r1', 'alice', 'blue')
+    r = roster.ensure_member(rooms, 'r1', 'alice')
+    assert r.blue_list == ['alice'] and r.none_list == []
+
+
+def test_to_event_counts(rooms):
+    roster.set_team(rooms, 'r1', 'alice', 'red')
+    roster.set_team(rooms, 'r1', 'bob', 'red')
+    roster.set_team(rooms, 'r1', 'carol', 'blue')
+    event = roster.load(rooms, 'r1').to_event()
+    assert event['counts'] == {'red': 2, 'blue': 1}
+    assert list(roster.load(rooms, 'r1').playing()) == ['alice', 'bob', 'carol']
+
@@ -0,0 +1,65 @@
+# tests/test_scheduler.py
+import eventlet
+
+from util.scheduler import Scheduler
+
+
+def test_events_fire_in_order():
+    sched, fired = Scheduler(), []
+    sched.schedule(0.03, fired.append, 'late')
+    sched.schedule(0.01, fired.append, 'early')
+    sched.schedule(0.02, fired.append, 'middle')
+    assert sched.backlog() == 3
+    eventlet.sleep(0.1)
+    assert fired == ['early', 'middle', 'late']
+    assert sched.backlog() == 0
+
+
+def test_cancel():
+    sched, fired = Scheduler(), []
+    keep = sched.schedule(0.01, fired.append, 'keep', group='room')
+    drop = sched.schedule(0.01, fired.append, 'drop', group='room')
+    sched.cancel(drop)
+    assert sched.backlog() == 1
+    eventlet.sleep(0.05)
+    assert fired == ['keep']
+    assert not keep.cancelled and drop.cancelled
+
+
+def test_cancel_group():
+    sched, fired = Scheduler(), []
+    for i in range(3):
+        sched.schedule(0.01 * (i + 1), fired.append, f'a{i}', group='room-a')
+    sched.schedule(0.02, fired.append, 'b', group='room-b')
+    sched.schedule(0.02, fired.append, 'free')
+
+    assert sched.cancel_group('room-a') == 3
+    assert sched.cancel_group('room-a') == 0
+    assert sched.cancel_group('nobody') == 0
+    eventlet.sleep(0.08)
+    assert sorted(fired) == ['b', 'free']
+
+
+def test_cancelled_event_is_dropped_from_its_group():
+    sched, fired = Scheduler(), []
+    ev = sched.schedule(0.01, fired.append, 'x', group='room')
+    sched.cancel(ev)
+    assert sched.cancel_group('room') == 0
+
+
+def test_earlier_event_wakes_the_runner():
+    sched, fired = Scheduler(), []
+    sched.schedule(5, fired.append, 'far')
+    eventlet.sleep(0)          # runner now sleeping until the far event
+    sched.schedule(0.01, fired.append, 'soon')
+    eventlet.sleep(0.05)
+    assert fired == ['soon']
+    assert sched.backlog() == 1
+
+
+def test_failing_event_does_not_stop_the_runner():
+    sched, fired = Scheduler(), []
+    sched.schedule(0.01, lambda: 1 / 0)
+    sched.schedule(0.02, fired.append, 'after')
+    eventlet.sleep(0.05)
+    assert fired == ['after']
@@ -0,0 +1,55 @@
+# tests/test_terrain.py
+import pytest
+
+from util.terrain import (BLUE_SAFE, CHUNK_SIZE, RED_SAFE, Terrain, WALL, from_doc)
+
+
+def _all_chunks(terrain, order):
+    return {(cx, cy): terrain.chunk(cx, cy) for cx, cy in order}
+
+
+@pytest.mark.parametrize('width,height', [(30, 20), (100, 70), (CHUNK_SIZE * 2, CHUNK_SIZE)])
+def test_spec_rebuilds_the_same_chunks_in_any_order(width, height):
+    terrain = Terrain.generate(width, height, seed=1234)
+    keys = [(cx, cy) for cy in range(terrain.chunk_rows) for cx in range(terrain.chunk_cols)]
+    first = _all_chunks(terrain, keys)
+
+    rebuilt = Terrain.from_spec(terrain.spec())
+    assert _all_chunks(rebuilt, reversed(keys)) == first
+    for (cx, cy), tiles in first.items():
+        cw, ch = terrain.chunk_dims(cx, cy)
+        assert len(tiles) == cw * ch
+
+
+def test_different_seeds_differ():
+    a = Terrain.generate(100, 70, seed=1).tiles()
+    b = Terrain.generate(100, 70, seed=2).tiles()
+    assert a != b
+
+
+def test_safe_zones_and_walls():
+    terrain = Terrain.generate(70, 45, seed=9)
+    assert terrain.tile(0, 0) == RED_SAFE and terrain.tile(1, 1) == RED_SAFE
+    assert terrain.tile(69, 44) == BLUE_SAFE and terrain.tile(68, 43) == BLUE_SAFE
+    assert WALL in terrain.tiles()
+    assert terrain.tile(*terrain.spawn_point('red')) == RED_SAFE
+    assert terrain.tile(*terrain.spawn_point('blue')) == BLUE_SAFE
+
+
+def test_stored_grid_round_trip():
+    rows = [[(x * y) % 4 for x in range(37)] for y in range(35)]
+    terrain = Terrain.from_rows(rows)
+    spec = terrain.spec()
+    assert 'tiles' in spec and 'seed' not in spec
+    assert Terrain.from_spec(spec).to_rows() == rows
+
+
+def test_from_doc():
+    spec = Terrain.generate(40, 30, seed=5).spec()
+    assert from_doc({'map': spec}).tiles() == Terrain.from_spec(spec).tiles()
+    assert from_doc({'terrain': [[0, 1], [1, 0]]}).to_rows() == [[0, 1], [1, 0]]
+
+
+def test_unknown_generator_version():
+    with pytest.raises(ValueError):
+        Terrain.from_spec({'seed': 1, 'version': 999, 'width': 10, 'height': 10})
@@ -0,0 +1,65 @@
+# tools/cluster.py
+"""
+Launch several server.py workers on one machine (see util/cluster.py).
+
+    python tools/cluster.py --workers 4 --base-port 8081 \
+        --message-queue redis://localhost:6379/0
+
+Each worker gets WORKER_ID, PORT, WORKER_URLS and MESSAGE_QUEUE in its
+environment.  Point browsers at any worker; room pages redirect to the
+worker that owns the room.  Ctrl-C stops them all.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run server.py as several room-pinned workers')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='localhost', help='host name the workers are reached by')
+    parser.add_argument('--base-port', type=int, default=8081)
+    parser.add_argument('--message-queue', default=os.environ.get('MESSAGE_QUEUE'),
+                        help='Socket.IO message queue URL shared by the workers')
+    args = parser.parse_args()
+
+    if args.workers > 1 and not args.message_queue:
+        parser.error('--message-queue is required with more than one worker')
+
+    ports = [args.base_port + i for i in range(args.workers)]
+    urls = ','.join(f'http://{args.host}:{port}' for port in ports)
+
+    procs = []
+    for worker_id, port in enumerate(ports):
+        env = dict(os.environ,
+                   WORKER_ID=str(worker_id),
+                   WORKER_URLS=urls,
+                   PORT=str(port))
+        if args.message_queue:
+            env['MESSAGE_QUEUE'] = args.message_queue
+        procs.append(subprocess.Popen([sys.executable, 'server.py'], cwd=ROOT, env=env))
+        print(f'worker {worker_id}: http://{args.host}:{port}')
+
+    try:
+        for proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == '__main__':
+    main()
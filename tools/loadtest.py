@@ -0,0 +1,384 @@
+# tools/loadtest.py
+"""
+End-to-end load test: N rooms × M simulated players against server.py.
+
+Every simulated player registers and logs in over HTTP, then goes
+through the real Socket.IO flow: /lobby create_room (owner), page_ready,
+join_team, start_game (owner), then /battlefield join_room and a stream
+of `move` events.  With --policy bots (the default) the moves come from
+util/bots.py players that chase and flee using the positions, tags and
+rounds the server sends, so rooms see real tags and respawns; --policy
+wander walks in random directions instead.  After a warm-up the harness
+measures, over a fixed window:
+
+  • move → server ack of that input latency (p50 / p90 / p99 / max)
+  • moves sent per second and events received per second
+  • Mongo ops per move and server CPU (from tools/loadtest_server.py)
+
+With the same --seed and arguments two runs are directly comparable.
+
+    python tools/loadtest.py --rooms 4 --players 8 --duration 20
+    python tools/loadtest.py --url http://127.0.0.1:8090 --json run.json
+
+Needs the Socket.IO client extras:  pip install "python-socketio[client]"
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+try:
+    import requests
+    import socketio
+except ImportError:
+    sys.exit('loadtest needs: pip install "python-socketio[client]" requests')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from util.bots import Bot                                 # noqa: E402
+
+PASSWORD = 'Loadtest1!'
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+SETUP_TIMEOUT_SEC = 15
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+class SimPlayer:
+    def __init__(self, url, name, rng, policy='bots'):
+        self.url = url
+        self.name = name
+        self.rng = rng
+        self.bot = Bot(random.Random(rng.random())) if policy == 'bots' else None
+        self.token = None
+        self.lobby = None
+        self.battle = None
+
+        self.joined_team = threading.Event()
+        self.game_started = threading.Event()
+        self.rooms_seen = []
+
+        self.lock = threading.Lock()
+        self.measuring = False
+        self.seq = 0
+        self.sent_at = {}          # input seq → send time, until the server acks it
+        self.latencies = []
+        self.moves_sent = 0
+        self.events_received = 0
+
+        # what the bot sees: id → SimpleNamespace(id, x, y, team, alive)
+        self.view = {}
+        self.attacking_team = None
+
+    # ─── HTTP auth ─────────────────────────────────────
+    def login(self):
+        http = requests.Session()
+        http.post(f'{self.url}/register', data={'username': self.name, 'password': PASSWORD})
+        http.post(f'{self.url}/login', data={'username': self.name, 'password': PASSWORD},
+                  allow_redirects=False)
+        self.token = http.cookies.get('auth_token')
+        if not self.token:
+            raise RuntimeError(f'login failed for {self.name}')
+
+    # ─── /lobby ────────────────────────────────────────
+    def connect_lobby(self, room_id=None):
+        query = f'?page=team_select&room_id={room_id}' if room_id else '?page=create_lobby'
+        client = socketio.Client(reconnection=False)
+        client.on('room_added', self.rooms_seen.append, namespace='/lobby')
+        client.on('joined_team', lambda *_: self.joined_team.set(), namespace='/lobby')
+        client.on('game_started', lambda *_: self.game_started.set(), namespace='/lobby')
+        client.connect(f'{self.url}{query}', namespaces=['/lobby'], transports=['websocket'],
+                       headers={'Cookie': f'auth_token={self.token}'})
+        self.lobby = client
+
+    def create_room(self, room_name):
+        self.lobby.emit('create_room', room_name, namespace='/lobby')
+        deadline = time.monotonic() + SETUP_TIMEOUT_SEC
+        while time.monotonic() < deadline:
+            for room in list(self.rooms_seen):
+                if room['name'] == room_name:
+                    return room['id']
+            time.sleep(0.05)
+        raise RuntimeError(f'room {room_name} never showed up in room_added')
+
+    def join_team(self, room_id, team):
+        self.lobby.emit('page_ready', {'room_id': room_id, 'page': 'team_select'}, namespace='/lobby')
+        self.lobby.emit('join_team', {'room_id': room_id, 'team': team}, namespace='/lobby')
+        if not self.joined_team.wait(SETUP_TIMEOUT_SEC):
+            raise RuntimeError(f'{self.name} never joined team {team}')
+
+    def start_game(self, room_id):
+        self.lobby.emit('start_game', {'room_id': room_id}, namespace='/lobby')
+        if not self.game_started.wait(SETUP_TIMEOUT_SEC):
+            raise RuntimeError(f'game in room {room_id} never started')
+
+    # ─── /battlefield ──────────────────────────────────
+    def join_battlefield(self, room_id):
+        self.room_id = room_id
+        client = socketio.Client(reconnection=False)
+        client.on('players_moved', self._on_players_moved, namespace='/battlefield')
+        if self.bot is not None:
+            for event, handler in (('player_positions', self._on_positions),
+                                   ('player_tagged', self._on_tagged),
+                                   ('players_respawned', self._on_respawned),
+                                   ('player_left', self._on_left),
+                                   ('round_prep', self._on_round),
+                                   ('round_start', self._on_round)):
+                client.on(event, handler, namespace='/battlefield')
+        client.on('*', self._on_any, namespace='/battlefield')
+        client.connect(f'{self.url}?page=battlefield', namespaces=['/battlefield'],
+                       transports=['websocket'], headers={'Cookie': f'auth_token={self.token}'})
+        client.emit('join_room', {'room_id': room_id, 'player': self.name}, namespace='/battlefield')
+        self.battle = client
+
+    def _on_any(self, event, *args):
+        with self.lock:
+            if self.measuring:
+                self.events_received += 1
+
+    # events with their own handler skip '*', so these count themselves
+    def _on_positions(self, players):
+        with self.lock:
+            if self.measuring:
+                self.events_received += 1
+            self.view = {p['id']: SimpleNamespace(id=p['id'], x=p['x'], y=p['y'],
+                                                  team=p.get('team'), alive=True)
+                         for p in players}
+
+    def _on_tagged(self, tag):
+        with self.lock:
+            if self.measuring:
+                self.events_received += 1
+            victim = self.view.get(tag['target'])
+            if victim:
+                victim.alive = False
+
+    def _on_respawned(self, respawned):
+        with self.lock:
+            if self.measuring:
+                self.events_received += 1
+            for p in respawned:
+                record = self.view.get(p['id'])
+                if record:
+                    record.alive, record.team = True, p['team']
+
+    def _on_left(self, left):
+        with self.lock:
+            if self.measuring:
+                self.events_received += 1
+            self.view.pop(left['id'], None)
+
+    def _on_round(self, round_info):
+        with self.lock:
+            if self.measuring:
+                self.events_received += 1
+            self.attacking_team = round_info.get('taggers')
+
+    def _on_players_moved(self, moved):
+        now = time.monotonic()
+        with self.lock:
+            if self.measuring:
+                self.events_received += 1
+            for p in moved:
+                record = self.view.get(p['id'])
+                if record:
+                    record.x, record.y = p['x'], p['y']
+            ack = next((p.get('seq', 0) for p in moved if p['id'] == self.name), 0)
+            for seq in [s for s in self.sent_at if s <= ack]:
+                sent = self.sent_at.pop(seq)
+                if self.measuring:
+                    self.latencies.append(now - sent)
+
+    def run_moves(self, stop, move_hz):
+        interval = 1.0 / move_hz
+        dx, dy = self.rng.choice(DIRECTIONS)
+        next_turn = time.monotonic() + self.rng.uniform(0.5, 1.5)
+        next_send = time.monotonic()
+        while not stop.is_set():
+            now = time.monotonic()
+            if now >= next_turn:
+                dx, dy = self.rng.choice(DIRECTIONS)
+                next_turn = now + self.rng.uniform(0.5, 1.5)
+            keys = {'ArrowUp': dy < 0, 'ArrowDown': dy > 0,
+                    'ArrowLeft': dx < 0, 'ArrowRight': dx > 0}
+            if self.bot is not None:
+                with self.lock:
+                    me = self.view.get(self.name)
+                    if me is not None:
+                        keys = self.bot.keys(me, list(self.view.values()), self.attacking_team)
+            with self.lock:
+                self.seq += 1
+                seq = self.seq
+                self.sent_at[seq] = now
+                if self.measuring:
+                    self.moves_sent += 1
+            try:
+                self.battle.emit('move', {'roomId': self.room_id, 'player': self.name,
+                                          'direction': keys, 'seq': seq}, namespace='/battlefield')
+            except Exception:
+                return
+            next_send += interval
+            time.sleep(max(0.0, next_send - time.monotonic()))
+
+    def close(self):
+        for client in (self.lobby, self.battle):
+            if client is not None:
+                try:
+                    client.disconnect()
+                except Exception:
+                    pass
+
+
+def set_up_room(url, run_id, room_no, players, rng, policy):
+    sims = [SimPlayer(url, f'lt{run_id}r{room_no}p{i}', random.Random(rng.random()), policy)
+            for i in range(players)]
+    for sim in sims:
+        sim.login()
+
+    owner = sims[0]
+    owner.connect_lobby()
+    room_id = owner.create_room(f'loadtest-{run_id}-{room_no}')
+    owner.lobby.disconnect()
+
+    for i, sim in enumerate(sims):
+        sim.connect_lobby(room_id)
+        sim.join_team(room_id, 'red' if i % 2 == 0 else 'blue')
+    owner.start_game(room_id)
+
+    for sim in sims:
+        sim.lobby.disconnect()
+        sim.lobby = None
+        sim.join_battlefield(room_id)
+    return sims
+
+
+def server_stats(url):
+    return requests.get(f'{url}/loadtest/stats', timeout=5).json()
+
+
+def spawn_server(port, mongo):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'tools', 'loadtest_server.py'),
+                             '--port', str(port), '--mongo', mongo],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{url}/loadtest/stats', timeout=1)
+            return proc, url
+        except requests.ConnectionError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError('load test server did not come up')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Socket.IO load test for server.py')
+    parser.add_argument('--url', help='target a running tools/loadtest_server.py instead of spawning one')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--mongo', choices=('local', 'mongomock'), default='mongomock')
+    parser.add_argument('--rooms', type=int, default=2)
+    parser.add_argument('--players', type=int, default=4, help='players per room')
+    parser.add_argument('--move-hz', type=float, default=20.0,
+                        help='move events per player per second (the browser sends one per server tick)')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--policy', choices=('bots', 'wander'), default='bots',
+                        help='util/bots.py players, or random walkers')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    proc = None
+    if args.url:
+        url = args.url.rstrip('/')
+    else:
+        proc, url = spawn_server(args.port, args.mongo)
+
+    run_id = uuid.uuid4().hex[:6]
+    sims = []
+    stop = threading.Event()
+    try:
+        for room_no in range(args.rooms):
+            sims.extend(set_up_room(url, run_id, room_no, args.players, rng, args.policy))
+
+        threads = [threading.Thread(target=s.run_moves, args=(stop, args.move_hz), daemon=True)
+                   for s in sims]
+        for t in threads:
+            t.start()
+        time.sleep(args.warmup)
+
+        before = server_stats(url)
+        for s in sims:
+            with s.lock:
+                s.measuring = True
+        time.sleep(args.duration)
+        for s in sims:
+            with s.lock:
+                s.measuring = False
+        after = server_stats(url)
+
+        stop.set()
+        for t in threads:
+            t.join(timeout=2)
+    finally:
+        stop.set()
+        for s in sims:
+            s.close()
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    window = after['wall'] - before['wall']
+    latencies_ms = [l * 1000 for s in sims for l in s.latencies]
+    moves = sum(s.moves_sent for s in sims)
+    received = sum(s.events_received for s in sims)
+    mongo = after['mongo_ops'] - before['mongo_ops']
+    cpu = (after['cpu_user'] - before['cpu_user']) + (after['cpu_sys'] - before['cpu_sys'])
+
+    report = {
+        'config': {k: getattr(args, k) for k in ('rooms', 'players', 'move_hz', 'warmup',
+                                                 'duration', 'seed', 'mongo', 'policy')},
+        'window_sec': round(window, 3),
+        'moves_sent': moves,
+        'moves_per_sec': round(moves / window, 1),
+        'events_received': received,
+        'events_received_per_sec': round(received / window, 1),
+        'latency_ms': {
+            'samples': len(latencies_ms),
+            'p50': round(percentile(latencies_ms, 50), 2),
+            'p90': round(percentile(latencies_ms, 90), 2),
+            'p99': round(percentile(latencies_ms, 99), 2),
+            'max': round(max(latencies_ms, default=0.0), 2),
+        },
+        'mongo_ops': mongo,
+        'mongo_ops_per_move': round(mongo / moves, 4) if moves else 0.0,
+        'server_cpu_sec': round(cpu, 3),
+        'server_cpu_pct': round(100.0 * cpu / window, 1),
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# tools/loadtest_server.py
+"""
+Run server.py for a load test.
+
+Same app and handlers as production, plus:
+  • --mongo mongomock  swaps MongoDB for an in-process mongomock store
+                        (default "local" uses util/database.py as-is,
+                        i.e. a local mongod)
+  • every Mongo collection call is counted
+  • GET /loadtest/stats returns {"mongo_ops", "cpu_user", "cpu_sys", "wall"}
+    so tools/loadtest.py can diff them around its measurement window.
+
+    python tools/loadtest_server.py --port 8090 --mongo mongomock
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# collection methods that each cost one round trip to Mongo
+COUNTED_METHODS = ('find', 'find_one', 'insert_one', 'update_one', 'update_many',
+                   'delete_one', 'delete_many', 'bulk_write', 'find_one_and_update',
+                   'count_documents', 'aggregate')
+
+mongo_ops = 0
+_depth = threading.local()
+
+
+def _count_calls(collection_cls):
+    """Wrap <collection_cls> methods so only the outermost call is counted."""
+    def wrap(fn):
+        def counted(self, *args, **kwargs):
+            global mongo_ops
+            depth = getattr(_depth, 'n', 0)
+            if depth == 0:
+                mongo_ops += 1
+            _depth.n = depth + 1
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                _depth.n = depth
+        counted.__name__ = fn.__name__
+        return counted
+
+    for name in COUNTED_METHODS:
+        fn = getattr(collection_cls, name, None)
+        if fn is not None:
+            setattr(collection_cls, name, wrap(fn))
+
+
+def _use_mongomock():
+    import mongomock
+    import mongomock.collection
+    import pymongo
+
+    # mongomock 4.3 predates pymongo 4.9 passing sort= to bulk updates
+    builder = mongomock.collection.BulkOperationBuilder
+    add_update = builder.add_update
+
+    def _add_update(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+    builder.add_update = _add_update
+
+    pymongo.MongoClient = mongomock.MongoClient
+    return mongomock.collection.Collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--mongo', choices=('local', 'mongomock'), default='mongomock')
+    args = parser.parse_args()
+
+    if args.mongo == 'mongomock':
+        collection_cls = _use_mongomock()
+    else:
+        from pymongo.collection import Collection as collection_cls
+    _count_calls(collection_cls)
+
+    import server
+    from flask import jsonify
+
+    @server.app.route('/loadtest/stats')
+    def loadtest_stats():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return jsonify({'mongo_ops': mongo_ops,
+                        'cpu_user': usage.ru_utime,
+                        'cpu_sys': usage.ru_stime,
+                        'wall': time.monotonic()})
+
+    server.socketio.run(server.app, host=args.host, port=args.port,
+                        allow_unsafe_werkzeug=True, debug=False, log_output=False)
+
+
+if __name__ == '__main__':
+    main()
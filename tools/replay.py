@@ -0,0 +1,122 @@
+# tools/replay.py
+"""
+Replay recorded match logs (util/match_log.py) without a server or clients.
+
+Each log is re-run through util/simulation.py, the same movement,
+collision, tag and respawn rules the server applies, as fast as the CPU
+allows.  At every recorded round end the replayed winner, team counts
+and state digest are compared with the recorded ones, as is the team of
+every recorded respawn; any difference is a behaviour change.  The exit
+status is 1 when a log diverges, so this doubles as a regression check
+for physics changes, and --repeat turns captured matches into a
+benchmark workload.
+
+    python tools/replay.py logs/matches/*.mlog
+    python tools/replay.py --repeat 20 --json replay.json logs/matches/<room>.mlog
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from util import match_log, simulation                    # noqa: E402
+from util.match_log import JOIN, LEAVE, RESPAWN, ROUND_END, START, TAGGERS, TICK  # noqa: E402
+from util.room_state import RoomState                     # noqa: E402
+from util.ticker import MOVE_STEP                         # noqa: E402
+
+
+def replay(records):
+    """Run one decoded log; returns its report."""
+    state, ids = None, {}
+    stats = {'ticks': 0, 'inputs': 0, 'tags': 0, 'respawns': 0, 'joins': 0, 'leaves': 0,
+             'rounds': [], 'mismatches': [], 'recorded_sec': 0.0}
+    for kind, ms, payload in records:
+        stats['recorded_sec'] = ms / 1000
+        if kind == START:
+            if abs(payload['move_step'] - MOVE_STEP) > 1e-9:
+                stats['mismatches'].append(
+                    f"recorded with move_step {payload['move_step']}, replaying with {MOVE_STEP}"
+                    " (set TICK_RATE / MOVE_SPEED to match)")
+            state = RoomState({'id': payload['room'], 'players': payload['players'],
+                               'attacking_team': payload['attacking_team'],
+                               'map': payload['map']})
+            ids = {p['idx']: p['id'] for p in payload['players']}
+            continue
+        if state is None:
+            raise ValueError('log does not start with a START record')
+
+        if kind == TICK:
+            inputs = {ids[idx]: [(None, match_log.decode_keys(bits)) for bits in keys]
+                      for idx, keys in payload}
+            stats['ticks'] += 1
+            stats['inputs'] += sum(len(keys) for _, keys in payload)
+            moved, _ = simulation.apply_inputs(state, inputs)
+            if state.attacking_team:
+                for record in moved.values():
+                    if simulation.check_tag(state, record):
+                        stats['tags'] += 1
+        elif kind == JOIN:
+            stats['joins'] += 1
+        elif kind == LEAVE:
+            stats['leaves'] += 1
+            state.remove_player(ids[payload])
+        elif kind == TAGGERS:
+            state.set_attacking_team(payload)
+        elif kind == RESPAWN:
+            for idx, team in payload:
+                record = simulation.respawn(state, ids[idx])
+                stats['respawns'] += 1
+                if record is None or record.team != team:
+                    stats['mismatches'].append(
+                        f"{ms} ms: respawn of {ids[idx]} as {team}, replay has "
+                        f"{'no dead player' if record is None else record.team}")
+        elif kind == ROUND_END:
+            round_no, winner, red, blue, crc = payload
+            counts = state.team_counts()
+            got_winner = simulation.round_winner(counts['red'], counts['blue'])
+            got = (got_winner, counts['red'], counts['blue'], match_log.digest(state))
+            stats['rounds'].append({'round': round_no, 'winner': got_winner,
+                                    'red': counts['red'], 'blue': counts['blue']})
+            if got != (winner, red, blue, crc):
+                stats['mismatches'].append(
+                    f"round {round_no}: recorded {winner} {red}-{blue} digest {crc:08x}, "
+                    f"replay {got[0]} {got[1]}-{got[2]} digest {got[3]:08x}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deterministic replay of recorded match logs')
+    parser.add_argument('logs', nargs='+', help='.mlog files written by util/match_log.py')
+    parser.add_argument('--repeat', type=int, default=1, help='replay each log this many times')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    reports, diverged = [], False
+    for path in args.logs:
+        records = list(match_log.read(path))       # decode once; time the simulation only
+        started = time.perf_counter()
+        for _ in range(max(args.repeat, 1)):
+            stats = replay(records)
+        elapsed = (time.perf_counter() - started) / max(args.repeat, 1)
+
+        stats['log'] = path
+        stats['replay_sec'] = round(elapsed, 4)
+        stats['ticks_per_sec'] = round(stats['ticks'] / elapsed) if elapsed else None
+        stats['speedup'] = round(stats['recorded_sec'] / elapsed, 1) if elapsed else None
+        diverged |= bool(stats['mismatches'])
+        reports.append(stats)
+
+    print(json.dumps(reports, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+    sys.exit(1 if diverged else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# tools/simulate.py
+"""
+Headless batched match simulator for balancing maps and bots.
+
+Plays whole matches between util/bots.py players on freshly generated
+terrains (Terrain.generate, the generator behind
+generate_battlefield_terrain and every new room) with the server's own
+rules from util/simulation.py: one input per live player per tick, all
+movers of a tick resolved in one CollisionMask.resolve_batch pass,
+tags, respawns after RESPAWN_SEC and round winners as in util/rounds.py
+(the prep countdown between rounds is skipped).  Matches are spread
+over a process pool and run as fast as the CPU allows.
+
+Each match's seed also picks every player's spawn (a random floor tile;
+with the server's fixed corner spawns every match on a small map played
+out the same way) and each bot's policy: how often it presses random
+keys (up to 2 × BOT_NOISE) and how often it lags a tick behind
+(up to MAX_LAG).
+
+Reports tags per match and per player-minute, round winners (and how
+often the team that attacks first wins), ticks/sec and player-steps/sec.
+The same --seed and arguments give the same matches.
+
+    python tools/simulate.py --matches 1000 --players 8
+    python tools/simulate.py --matches 200 --width 64 --height 48 --json sim.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from util import simulation                               # noqa: E402
+from util.bots import BOT_NOISE, Bot                      # noqa: E402
+from util.respawns import RESPAWN_SEC                     # noqa: E402
+from util.room_state import RoomState                     # noqa: E402
+from util.rounds import MAX_ROUNDS, ROUND_TIME_SEC        # noqa: E402
+from util.terrain import FLOOR, MAP_HEIGHT, MAP_WIDTH, Terrain  # noqa: E402
+from util.ticker import TICK_RATE                         # noqa: E402
+
+MAX_LAG = 0.5
+
+
+def random_spawn(terrain: Terrain, rng: random.Random):
+    while True:
+        x, y = rng.randrange(terrain.width), rng.randrange(terrain.height)
+        if terrain.tile(x, y) == FLOOR:
+            return x, y
+
+
+def run_match(job) -> dict:
+    """Play one match; <job> is (seed, players, width, height, rounds, round_sec)."""
+    seed, n_players, width, height, rounds, round_sec = job
+    rng = random.Random(seed)
+    terrain = Terrain.generate(width, height, seed)
+
+    players = []
+    for i in range(n_players):
+        team = 'red' if i % 2 == 0 else 'blue'
+        x, y = random_spawn(terrain, rng)
+        players.append({'id': f'bot{i}', 'x': x, 'y': y, 'team': team})
+    state = RoomState({'id': f'sim-{seed}', 'players': players, 'map': terrain.spec()})
+    bots = {pid: Bot(random.Random(f'{seed}:{pid}'), noise=rng.uniform(0, 2 * BOT_NOISE),
+                     lag=rng.uniform(0, MAX_LAG))
+            for pid in state.players}
+
+    first_taggers = taggers = rng.choice(['red', 'blue'])
+    respawn_ticks = int(RESPAWN_SEC * TICK_RATE)
+    respawn_at = {}
+    tick = tags = steps = 0
+    winners = []
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        state.set_attacking_team(taggers)
+        for _ in range(int(round_sec * TICK_RATE)):
+            tick += 1
+            everyone = list(state.players.values())
+            inputs = {p.id: [(None, bots[p.id].keys(p, everyone, state.attacking_team))]
+                      for p in everyone if p.alive}
+            steps += len(inputs)
+
+            moved, _ = simulation.apply_inputs(state, inputs)
+            for record in moved.values():
+                hit = simulation.check_tag(state, record)
+                if hit:
+                    tags += 1
+                    respawn_at[hit[0].id] = tick + respawn_ticks
+
+            for pid in [pid for pid, at in respawn_at.items() if at <= tick]:
+                del respawn_at[pid]
+                simulation.respawn(state, pid)
+
+        counts = state.team_counts()
+        winners.append(simulation.round_winner(counts['red'], counts['blue']))
+        taggers = 'blue' if taggers == 'red' else 'red'
+
+    return {'seed': seed, 'first_taggers': first_taggers, 'winners': winners, 'tags': tags,
+            'ticks': tick, 'steps': steps, 'cpu_sec': time.perf_counter() - started}
+
+
+def summarise(results, args, wall: float) -> dict:
+    ticks = sum(r['ticks'] for r in results)
+    steps = sum(r['steps'] for r in results)
+    tags = sum(r['tags'] for r in results)
+    sim_minutes = ticks / TICK_RATE / 60
+    round_winners = [Counter() for _ in range(args.rounds)]
+    match_winners = Counter()
+    first_attacker_wins = 0
+    for r in results:
+        for i, winner in enumerate(r['winners']):
+            round_winners[i][winner] += 1
+        final = r['winners'][-1]
+        match_winners[final] += 1
+        first_attacker_wins += final == r['first_taggers']
+
+    return {
+        'matches': len(results),
+        'players': args.players,
+        'map': f'{args.width}x{args.height}',
+        'rounds': args.rounds,
+        'round_sec': args.round_sec,
+        'tags_per_match': round(tags / len(results), 2),
+        'tags_per_player_minute': round(tags / (args.players * sim_minutes), 3) if ticks else 0,
+        'round_winners': [dict(c) for c in round_winners],
+        'match_winners': dict(match_winners),
+        'first_attackers_win_rate': round(first_attacker_wins / len(results), 3),
+        'wall_sec': round(wall, 2),
+        'ticks_per_sec': round(ticks / wall),
+        'steps_per_sec': round(steps / wall),
+        'speedup': round(ticks / TICK_RATE / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless bot matches on generated terrain')
+    parser.add_argument('--matches', type=int, default=100)
+    parser.add_argument('--players', type=int, default=8, help='players per match')
+    parser.add_argument('--width', type=int, default=MAP_WIDTH)
+    parser.add_argument('--height', type=int, default=MAP_HEIGHT)
+    parser.add_argument('--rounds', type=int, default=MAX_ROUNDS)
+    parser.add_argument('--round-sec', type=float, default=ROUND_TIME_SEC)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    jobs = [(args.seed * 1_000_003 + i, args.players, args.width, args.height,
+             args.rounds, args.round_sec) for i in range(args.matches)]
+    started = time.perf_counter()
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(run_match, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))))
+    else:
+        results = [run_match(job) for job in jobs]
+    report = summarise(results, args, time.perf_counter() - started)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,10 @@ from flask import request,make_response
 import uuid
 import bcrypt
 import hashlib
+import time
 from util.database import user_collection
+from util import cluster, user_cache
+from util import leaderboard as leaderboard_service
 from flask import current_app, render_template, request, redirect, url_for, g
 from werkzeug.utils import secure_filename
 auth_bp = Blueprint('auth', __name__)
@@ -46,6 +49,7 @@ def register():
         "wins": 0
     })
 
+    leaderboard_service.note_new_user(user)
     logging.info(f"Registration successful: user '{user}' created")
     resp = make_response(redirect("/"))
     resp.set_cookie("session", user_id)
@@ -77,6 +81,8 @@ def login():
     token = str(uuid.uuid4())
     hashed = hash_token(token)
     user_collection.update_one({"username": user}, {"$set": {"auth_token": hashed}})
+    if dbEntry.get("auth_token"):
+        invalidate_token(dbEntry["auth_token"])
     logging.info(f"Login successful: user '{user}'")
 
     resp = make_response(redirect("/lobby"))
@@ -93,6 +99,7 @@ def logout():
         if user:
             logging.info(f"User '{user['username']}' logged out")
             user_collection.update_one({"auth_token": hashed}, {"$unset": {"auth_token": ""}})
+        invalidate_token(hashed)
 
     resp = make_response(redirect("/"))
     resp.set_cookie("auth_token", '', expires=0)
@@ -113,14 +120,72 @@ def hash_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
 
-@auth_bp.before_app_request
-def load_CurrentUser():
+# ─── Token → user cache and per-socket identity ─────────
+AUTH_CACHE_TTL_SEC = float(os.environ.get('AUTH_CACHE_TTL', 10))
+AUTH_CACHE_MAX = 10000
 
-    token = request.cookies.get("auth_token")
-    if token:
-        g.user = user_collection.find_one({"auth_token": hash_token(token)})
+_token_cache = {}   # hashed token → (expires_at, username or None)
+socket_users = {}   # socket sid → username, bound once at connect
+
+
+def user_for_token(token):
+    """
+    Profile of the user behind a raw auth_token cookie, or None.
+
+    Only token → username is cached here (AUTH_CACHE_TTL_SEC); the
+    profile itself comes from util.user_cache, which every write to
+    avatar or wins invalidates, so it is never staler than that cache.
+    """
+    if not token:
+        return None
+    hashed = hash_token(token)
+    now = time.monotonic()
+    entry = _token_cache.get(hashed)
+    if entry and entry[0] > now:
+        username = entry[1]
     else:
+        doc = user_collection.find_one({"auth_token": hashed}, {"_id": 0, "username": 1})
+        username = doc["username"] if doc else None
+        if len(_token_cache) >= AUTH_CACHE_MAX:
+            for key in [k for k, (exp, _) in _token_cache.items() if exp <= now]:
+                _token_cache.pop(key, None)
+            if len(_token_cache) >= AUTH_CACHE_MAX:
+                _token_cache.clear()
+        _token_cache[hashed] = (now + AUTH_CACHE_TTL_SEC, username)
+    if username is None:
+        return None
+    return user_cache.get_user(user_collection, username) or None
+
+
+def invalidate_token(hashed):
+    _token_cache.pop(hashed, None)
+
+
+def bind_socket_user(sid):
+    """Resolve the connecting socket's cookie once and remember who it is."""
+    user = user_for_token(request.cookies.get("auth_token"))
+    if not user:
+        return None
+    socket_users[sid] = user["username"]
+    return user["username"]
+
+
+def socket_user(sid):
+    return socket_users.get(sid)
+
+
+def unbind_socket_user(sid):
+    return socket_users.pop(sid, None)
+
+
+@auth_bp.before_app_request
+def load_CurrentUser():
+    # static assets never need the user
+    if request.endpoint == 'static':
         g.user = None
+        return
+
+    g.user = user_for_token(request.cookies.get("auth_token"))
 ALLOWED_EXT = {'png','jpg','jpeg'}
 def allowed_file(fn):
     return '.' in fn and fn.rsplit('.',1)[1].lower() in ALLOWED_EXT
@@ -145,6 +210,7 @@ def profile():
                 {'username': user['username']},
                 {'$set': {'avatar': filename}}
             )
+            user_cache.invalidate(user['username'])
         return redirect(url_for('auth.profile'))
 
     # GET — render form
@@ -154,26 +220,39 @@ def profile():
 
 @auth_bp.route('/api/whoami')
 def whoami():
-    token = request.cookies.get("auth_token")
-    if not token:
-        return jsonify({"username": None})
-
-    user = user_collection.find_one({"auth_token": hash_token(token)})
+    user = g.user
     if user:
         return jsonify({"username": user["username"]})
 
     return jsonify({"username": None})
 
+LEADERBOARD_PAGE_MAX = 100
+
 @auth_bp.route('/api/leaderboard')
 def leaderboard():
-    # Fetch all users
-    users = list(user_collection.find({}, {"_id": 0, "username": 1, "wins": 1}))
-
-    # Add default 0 for missing 'wins' field
-    for u in users:
-        u["wins"] = u.get("wins", 0)
-
-    # Sort in Python instead of MongoDB
-    sorted_users = sorted(users, key=lambda u: u["wins"], reverse=True)
+    # ?offset=&limit= pagination over the cached top-K
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), LEADERBOARD_PAGE_MAX)
+
+    version = leaderboard_service.current_version(user_collection)
+    if not leaderboard_service.is_cached(offset, limit):
+        # read from Mongo past the top K; the version doesn't cover it
+        resp = jsonify(leaderboard_service.page(user_collection, offset, limit))
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
+
+    etag = f"lb-{cluster.WORKER_ID}-{version}-{offset}-{limit}"
+    if request.if_none_match.contains_weak(etag):
+        resp = make_response('', 304)
+    else:
+        resp = jsonify(leaderboard_service.page(user_collection, offset, limit))
+    resp.set_etag(etag, weak=True)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
-    return jsonify(sorted_users)
+@auth_bp.route('/api/leaderboard/rank/<username>')
+def leaderboard_rank(username):
+    entry = leaderboard_service.rank_of(user_collection, username)
+    if not entry:
+        return jsonify({"error": "Unknown user"}), 404
+    return jsonify(entry)
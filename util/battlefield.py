@@ -1,293 +1,232 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, redirect
 from flask_socketio import emit, join_room
-from util.auth import hash_token
-from eventlet import sleep
-from eventlet.semaphore import Semaphore
-import math
+from util.auth import bind_socket_user, socket_user, unbind_socket_user
 
-from util.database import user_collection
-from util.rooms import choose_avatar, enrich_with_avatars
+from util import (cluster, input_limiter, interest, match_log, respawns, room_state, protocol,
+                  simulation)
+from util.protocol import FORMAT_BIN, FORMAT_JSON, format_room
+from util.rounds import abandon_room
+from util.terrain import CHUNK_SIZE
+from util.ticker import buffer_input, ensure_room_ticker, INPUT_BACKLOG, MOVE_STEP, TICK_RATE
 
-# Constants for map size
-MAP_WIDTH = 30
-MAP_HEIGHT = 20
+from util.rooms import enrich_with_avatars
 
-terrain = [[0 for _ in range(MAP_WIDTH)] for _ in range(MAP_HEIGHT)]
+MAX_CHUNKS_PER_REQUEST = 16
 
-for y in range(MAP_HEIGHT):
-    for x in range(MAP_WIDTH):
-        if y < 4 and x >= MAP_WIDTH - 4:
-            inside = (x >= MAP_WIDTH - 3 and x <= MAP_WIDTH - 2) and (y >= 1 and y <= 2)
-            terrain[y][x] = 0 if inside else 3  # red base walls
-        elif y >= MAP_HEIGHT - 4 and x < 4:
-            terrain[y][x] = 2  # blue base walls
-        elif (x + y) % 11 == 0 and 3 < x < MAP_WIDTH - 4 and 3 < y < MAP_HEIGHT - 4:
-            terrain[y][x] = 1  # scattered maze walls
-
-
-# Global memory
-room_player_data = {}  # { room_id: { player_name: {"x": int, "y": int, "team": str} } }
-player_status = {}     # { room_id: { player_name: "alive" or "dead", dx: -2.0 - 2.0, dy: -2.0 - 2.0} }
-room_player_data_lock = Semaphore()
-player_status_lock = Semaphore()
 
 def register_battlefield_handlers(socketio, user_collection, room_collection):
 
+    room_state.start_flusher(socketio, room_collection)
+
     @socketio.on('connect', namespace='/battlefield')
     def handle_battlefield_connect():
+        bind_socket_user(request.sid)
         print('Client connected to battlefield')
 
     @socketio.on('join_room', namespace='/battlefield')
     def handle_battlefield_join_room(data):
         room_id = data.get('room_id')
         player_id = data.get('player')
+        fmt = FORMAT_BIN if data.get('format') == FORMAT_BIN else FORMAT_JSON
 
-        if room_id:
+        if room_id and cluster.owns_room(room_id):
             join_room(room_id)
+            join_room(format_room(room_id, fmt))
+            protocol.subscribe(request.sid, room_id, fmt, socket_user(request.sid) or player_id)
 
             # 🔥 Immediately emit the current player positions after joining
-            room = room_collection.find_one({"id": room_id})
-            if not room:
+            state = room_state.get_room(room_collection, room_id)
+            if not state:
                 return
+            match_log.record_join(state, socket_user(request.sid) or player_id)
+
+            send_positions(socketio, user_collection, state, fmt, request.sid, roster=True)
+            if state.terrain:
+                # only the size; the client asks for the chunks around it
+                emit('map_info', {'width': state.terrain.width, 'height': state.terrain.height,
+                                  'chunk': CHUNK_SIZE},
+                     room=request.sid, namespace='/battlefield')
+
+    @socketio.on('get_chunks', namespace='/battlefield')
+    def handle_get_chunks(data):
+        if not isinstance(data, dict):
+            return
+        room_id = data.get('room_id')
+        wanted = data.get('chunks') or []
+        if not isinstance(wanted, list):
+            return
+        if not room_id or not cluster.owns_room(room_id):
+            return
+        state = room_state.get_room(room_collection, room_id)
+        if not state or not state.terrain:
+            return
 
-            players = room.get('players', [])
-            updated_players = []
-
-            room_doc = room_collection.find_one({"id": room_id})
-
-            for p in players:
-                user_doc = user_collection.find_one({"username": p["id"]})
-                p["avatar"] = choose_avatar(p["id"], room_doc, user_doc)
-                updated_players.append(p)
-
-            emit('player_positions', updated_players, room=request.sid, namespace='/battlefield')
-            terrain_data = room.get('terrain')
-            if terrain_data:
-                emit('load_terrain', {'terrain': terrain_data}, room=request.sid, namespace='/battlefield')
+        field = state.terrain
+        for key in wanted[:MAX_CHUNKS_PER_REQUEST]:
+            try:
+                cx, cy = int(key[0]), int(key[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            if not field.has_chunk(cx, cy):
+                continue
+            cw, ch = field.chunk_dims(cx, cy)
+            emit('terrain_chunk', {'cx': cx, 'cy': cy, 'w': cw, 'h': ch,
+                                   'tiles': field.chunk(cx, cy)})
 
     @socketio.on('move', namespace='/battlefield')
     def handle_move(data):
+        if not isinstance(data, dict):
+            return
         room_id = data.get('roomId')
-        player = data.get('player')
+        player = socket_user(request.sid)
         keyPress = data.get('direction')
+        seq = data.get('seq')
 
-        if not room_id or not player or not keyPress:
+        # only your own player, and only a keyState dict: anything else
+        # would fail inside the room's tick, for every player in it
+        if not room_id or not player or data.get('player') not in (None, player):
             return
-
-        room = room_collection.find_one({'id': room_id})
-        if not room:
+        if not isinstance(keyPress, dict) or not keyPress:
             return
-
-        # fetch once
-        terrain = room.get('terrain', [[0] * MAP_WIDTH for _ in range(MAP_HEIGHT)])
-        player_list = room.get('players', [])
-        player_data = next((p for p in player_list if p['id'] == player), None)
-        if not player_data:
+        # only rooms this worker simulates, and only their live players;
+        # room_of never loads anything from Mongo
+        if not cluster.owns_room(room_id):
             return
-
-        with player_status_lock:
-            if player_status.get(room_id, {}).get(player, {}).get('status') == "dead":
-                return
-
-
-        # movement logic
-        new_x, new_y = player_data['x'], player_data['y']
-        if keyPress['ArrowUp']:
-            new_y = round((new_y - 0.1)*100)/100
-        if keyPress['ArrowDown']:
-            new_y = round((new_y + 0.1)*100)/100
-        if keyPress['ArrowLeft']:
-            new_x = round((new_x - 0.1)*100)/100
-        if keyPress['ArrowRight']:
-            new_x = round((new_x + 0.1)*100)/100
-
-        x_check, y_check = False, False
-        if not 0 <= new_x <= MAP_WIDTH-1:
-            new_x = clamp(new_x, 0, MAP_WIDTH-1)
-            x_check = True
-        if not 0 <= new_y <= MAP_HEIGHT-1:
-            new_y = clamp(new_y, 0, MAP_HEIGHT-1)
-            y_check = True
-        if x_check and y_check:
+        state = room_state.room_of(player)
+        if state is None or state.id != room_id or player not in state.players:
             return
-
-        f_new_x = math.floor(new_x)
-        c_new_x = math.ceil(new_x) if new_x % 1 != 0 else f_new_x
-        f_new_y = math.floor(new_y)
-        c_new_y = math.ceil(new_y) if new_y % 1 != 0 else f_new_y
-
-        tileTL = terrain[f_new_y][f_new_x]
-        tileTR = terrain[f_new_y][c_new_x]
-        tileBL = terrain[c_new_y][f_new_x]
-        tileBR = terrain[c_new_y][c_new_x]
-
-        old_x = new_x
-        enemy_team_num = 3 if player_data.get('team') == 'blue' else 2
-
-        if new_x != player_data['x'] and f_new_x != c_new_x:
-            if new_x < player_data['x']:
-                if (tileTL in (1, enemy_team_num)) or (tileBL in (1, enemy_team_num)):
-                    new_x = player_data['x']
-            elif new_x > player_data['x']:
-                if (tileTR in (1, enemy_team_num)) or (tileBR in (1, enemy_team_num)):
-                    new_x = player_data['x']
-
-        if new_y != player_data['y'] and f_new_y != c_new_y:
-            if new_y > player_data['y']:
-                if (tileBL in (1, enemy_team_num)) or (tileBR in (1, enemy_team_num)):
-                    new_y = player_data['y']
-            elif new_y < player_data['y']:
-                if (tileTL in (1, enemy_team_num)) or (tileTR in (1, enemy_team_num)):
-                    new_y = player_data['y']
-
-        result = room_collection.update_one(
-            {'id': room_id, 'players.id': player},
-            {'$set': {'players.$.x': new_x, 'players.$.y': new_y}}
-        )
-        if result.matched_count == 0:
+        # over this connection's input budget: drop before any other work
+        if not input_limiter.allow(request.sid):
             return
-
-        # update in-memory and enrich with avatars
-        user_cache = {}
-        for p in room['players']:
-            pid = p['id']
-            if pid not in user_cache:
-                user_cache[pid] = user_collection.find_one({"username": pid}) or {}
-            p['avatar'] = choose_avatar(pid, room, user_cache[pid])
-
-        with room_player_data_lock:
-            room_player_data[room_id] = {
-                p['id']: {'x': p['x'], 'y': p['y']}
-                for p in room['players'] if p.get('id')
-            }
-
+        if not isinstance(seq, int) or not 0 < seq < 2**32:
+            seq = None      # clients that don't predict send no sequence number
+
+        # only queue the input; the room's ticker applies it on a later tick
+        if buffer_input(room_id, player, keyPress, seq):
+            input_limiter.note_coalesced()
+        ensure_room_ticker(socketio, room_id, _tick_room)
+
+    def _tick_room(room_id, inputs):
+        """
+        Apply every player's queued inputs (one step each), run tag checks
+        once and emit a single batched `players_moved` update that also
+        acknowledges the last input seq applied per player.
+        """
+        state = room_state.get_room(room_collection, room_id)
+        if not state:
+            interest.drop_room(room_id)
+            return False
+        if not inputs:
+            return True
+
+        match_log.record_tick(state, inputs)
+        moved, acked = simulation.apply_inputs(state, inputs)
+
+        # players whose input was applied, even if a wall stopped them:
+        # their clients need the ack to drop those inputs from replay
+        updated = list({**acked, **moved}.values())
+        if not updated:
+            return True
 
         # tagging logic
-        attacking_team = room.get('attacking_team')
-        if attacking_team:
-            with room_player_data_lock:
-                for other_id, pos in room_player_data[room_id].items():
-                    if other_id == player:
-                        continue
-                    if abs(pos['x'] - new_x) <= 1 and abs(pos['y'] - new_y) <= 1:
-                        target_data = next((p for p in room['players'] if p['id'] == other_id), None)
-                        if not target_data:
-                            continue
-
-                        mover_team = player_data.get('team')
-                        target_team = target_data.get('team')
-                        if mover_team == target_team:
-                            continue
-
-                        if mover_team == attacking_team:
-                            victim, tagger = other_id, player
-                        elif target_team == attacking_team:
-                            victim, tagger = player, other_id
-                        else:
-                            continue
-
-                        with player_status_lock:
-                            if player_status.get(room_id, {}).get(victim, {}).get('status') == 'dead':
-                                continue
-                            player_status.setdefault(room_id, {})[victim] = {'status': 'dead', 'tagger': tagger}
-                        emit('player_tagged', {'tagger': tagger, 'target': victim}, room=room_id)
-                        socketio.start_background_task(respawn_player, socketio, room_collection, room_id, victim)
-                        break
-
-        emit('player_moved', {'id': player, 'x': new_x, 'y': new_y}, room=room_id, namespace='/battlefield')
+        if state.attacking_team:
+            for record in moved.values():
+                hit = simulation.check_tag(state, record)
+                if hit:
+                    victim, tagger = hit
+                    # room-wide even in AOI mode: it is rare and tiny, and
+                    # the interest snapshots carry no alive flag, so this is
+                    # how a viewer later walking up to the victim knows it
+                    # is dead
+                    socketio.emit('player_tagged', {'tagger': tagger.id, 'target': victim.id},
+                                  room=room_id, namespace='/battlefield')
+                    respawns.queue_respawn(socketio, room_collection, room_id, victim.id)
+
+        if interest.enabled(state):
+            # big room: each connection only hears about movers near it
+            for sid, fmt, records, left in interest.plan(state, updated, protocol.viewers(room_id)):
+                if records:
+                    _emit_moves(fmt, records, sid)
+                if left:
+                    socketio.emit('players_out_of_view', left, to=sid, namespace='/battlefield')
+            if interest.minimap_due(room_id):
+                socketio.emit('minimap', interest.encode_minimap(state),
+                              room=room_id, namespace='/battlefield')
+            return True
+
+        for fmt in (FORMAT_JSON, FORMAT_BIN):
+            if protocol.has_subscribers(room_id, fmt):
+                _emit_moves(fmt, updated, format_room(room_id, fmt))
+        return True
+
+    def _emit_moves(fmt, records, to):
+        if fmt == FORMAT_BIN:
+            socketio.emit('pos_frame', protocol.encode_delta(records),
+                          to=to, namespace='/battlefield')
+        else:
+            socketio.emit('players_moved',
+                          [{'id': p.id, 'x': p.x, 'y': p.y, 'seq': p.last_seq} for p in records],
+                          to=to, namespace='/battlefield')
 
     @socketio.on('disconnect', namespace='/battlefield')
     def handle_battlefield_disconnect():
         sid = request.sid
+        protocol.unsubscribe(sid)
+        input_limiter.forget(sid)
+        interest.forget(sid)
 
-        auth_token = request.cookies.get('auth_token')
-        if not auth_token:
+        username = unbind_socket_user(sid)
+        if not username:
             return
 
-        user = user_collection.find_one({'auth_token': hash_token(auth_token)})
-        if not user:
-            return
-
-        username = user['username']
-
 
         rooms = list(room_collection.find({"players.id": username}))
 
         for room in rooms:
             room_id = room["id"]
+            state = room_state.rooms.get(room_id)
+            if state is not None:
+                match_log.record_leave(state, username)
+            room_state.remove_player(room_id, username)
             room_collection.update_one(
                 {"id": room_id},
                 {"$pull": {"players": {"id": username}}
             })
 
-            updated = room_collection.find_one({"id": room_id})
             socketio.emit('player_left', {'id': username}, room=room_id, namespace='/battlefield')
 
+            # last player gone: stop the round clock and drop the match
+            if state is not None and not state.players:
+                abandon_room(room_collection, room_id)
+
     #gives latest player info after respawn
     @socketio.on('request_positions', namespace='/battlefield')
     def handle_request_positions():
-        auth_token = request.cookies.get('auth_token')
-        if not auth_token:
-            return
-
-        user = user_collection.find_one({'auth_token': hash_token(auth_token)})
-        if not user:
-            return
-
-        username = user['username']
-
-        # Find the room the user is in and get the latest full document
-        room = room_collection.find_one({"players.id": username})
-        if not room:
-            return
-
-        room_id = room['id']
-        
-        # Now re-fetch the full room document by its id to ensure up-to-date player list
-        updated_room = room_collection.find_one({"id": room_id})
-        if not updated_room:
+        username = socket_user(request.sid)
+        if not username:
             return
 
-        players_out = enrich_with_avatars(updated_room, user_collection)
-        emit('player_positions', players_out, namespace='/battlefield')
-
-
-def respawn_player(socketio, room_collection, room_id, player):
-    sleep(5)  # 5 seconds dead
-
-    with player_status_lock:
-        if room_id not in player_status or player not in player_status[room_id]:
+        # Find the room the user is in, from the live match state
+        state = room_state.room_of(username)
+        if not state:
             return
-        tagger = player_status[room_id][player].get('tagger')
-
-    # Fetch the tagger's team
-    room = room_collection.find_one({'id': room_id})
-    if not room:
-        return
-
-    tagger_data = next((p for p in room.get('players', []) if p['id'] == tagger), None)
-    if not tagger_data:
-        return
 
-    new_team = tagger_data['team']
+        send_positions(socketio, user_collection, state, protocol.format_of(request.sid),
+                       request.sid, roster=True)
 
-    # Update the player's team in database
-    room_collection.update_one(
-        {"id": room_id, "players.id": player},
-        {"$set": {"players.$.team": new_team}}
-    )
-    updated_room = room_collection.find_one({"id": room_id})
-    players_out = enrich_with_avatars(updated_room, user_collection)
-    socketio.emit('player_positions',players_out,room = room_id, namespace = '/battlefield')
 
-    # Mark as alive
-    with player_status_lock:
-        player_status[room_id][player] = {
-            "status": "alive"
-        }
-
-    # Tell clients
-    socketio.emit('player_respawned', {"player": player}, room=room_id, namespace='/battlefield')
+def send_positions(socketio, user_collection, state, fmt, to, roster=False):
+    """Send the full player list to <to> in wire format <fmt>."""
+    if fmt == FORMAT_BIN:
+        if roster:
+            players_out = enrich_with_avatars(state.to_doc(), user_collection)
+            socketio.emit('player_roster', protocol.encode_roster(players_out, state),
+                          room=to, namespace='/battlefield')
+        socketio.emit('pos_frame', protocol.encode_keyframe(state.players.values()),
+                      room=to, namespace='/battlefield')
+    else:
+        players_out = enrich_with_avatars(state.to_doc(), user_collection)
+        socketio.emit('player_positions', players_out, room=to, namespace='/battlefield')
 
 
 # Blueprint
@@ -298,7 +237,13 @@ def battlefield():
     room_id = request.args.get('room')
     if not room_id:
         return "Missing room ID", 400
-    return render_template('battlefield.html', room_id=room_id)
-
-def clamp(value, min_value, max_value):
-    return max(min_value, min(value, max_value))
\ No newline at end of file
+    # the battlefield simulation runs on the worker that owns the room
+    owner_url = cluster.room_redirect(room_id, request.full_path.rstrip('?'))
+    if owner_url:
+        return redirect(owner_url)
+    # the client predicts its own movement with the server's tick rate, step
+    # and input backlog, and needs the minimap interval to spot stale summaries
+    return render_template('battlefield.html', room_id=room_id,
+                           tick_rate=TICK_RATE, move_step=MOVE_STEP,
+                           input_backlog=INPUT_BACKLOG,
+                           minimap_interval=interest.MINIMAP_INTERVAL_SEC)
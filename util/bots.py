@@ -0,0 +1,81 @@
+# util/bots.py
+"""
+Scripted players for headless matches and load tests.
+
+Attackers chase the nearest live opponent, everyone else runs from the
+nearest attacker, and with no attacking team bots wander.  A bot that
+got stuck against a wall, or rolls under BOT_NOISE, presses random keys
+for a few ticks, which is enough to get around the small wall blocks the
+terrain generator places.  A bot with some `lag` keeps its previous
+input on that share of ticks instead of reacting, like a slower player.
+The output is the same keyState dict a browser sends in `move`.
+"""
+
+import os
+import random
+from typing import Iterable, Optional
+
+# ─── Tunables ────────────────────────────────────────────
+BOT_NOISE = float(os.environ.get('BOT_NOISE', 0.15))   # chance per tick of a random input
+WANDER_TICKS = 6                                       # ticks spent on one random input
+DEADZONE = 0.2                                         # tiles; closer than this on an axis → no key
+
+_KEYS = ('ArrowUp', 'ArrowDown', 'ArrowLeft', 'ArrowRight')
+
+
+class Bot:
+    __slots__ = ('rng', 'noise', 'lag', 'wander', 'wander_keys', 'last_pos', 'last_keys')
+
+    def __init__(self, rng: random.Random, noise: float = BOT_NOISE, lag: float = 0.0):
+        self.rng = rng
+        self.noise = noise          # chance per tick of starting a random input
+        self.lag = lag              # chance per tick of repeating the last input
+        self.wander = 0             # ticks of random input left
+        self.wander_keys = None
+        self.last_pos = None
+        self.last_keys = None
+
+    def keys(self, me, players: Iterable, attacking_team: Optional[str]) -> dict:
+        """keyState for <me> this tick, given every player in the room."""
+        pos = (me.x, me.y)
+        stuck = pos == self.last_pos
+        self.last_pos = pos
+
+        if self.wander <= 0 and (stuck or self.rng.random() < self.noise):
+            self.wander = WANDER_TICKS
+            self.wander_keys = {k: self.rng.random() < 0.5 for k in _KEYS}
+        if self.wander > 0:
+            self.wander -= 1
+            return self.wander_keys
+        if self.lag and self.last_keys is not None and self.rng.random() < self.lag:
+            return self.last_keys
+        self.last_keys = self._policy(me, players, attacking_team)
+        return self.last_keys
+
+    def _policy(self, me, players: Iterable, attacking_team: Optional[str]) -> dict:
+        """Chase, flee or wander, from scratch."""
+        if not attacking_team:
+            target, sign = None, 1
+        elif me.team == attacking_team:
+            target, sign = _nearest(me, players, lambda p: p.team != me.team and p.alive), 1
+        else:
+            target, sign = _nearest(me, players, lambda p: p.team == attacking_team), -1
+        if target is None:
+            self.wander = WANDER_TICKS
+            self.wander_keys = {k: self.rng.random() < 0.5 for k in _KEYS}
+            return self.wander_keys
+
+        dx, dy = sign * (target.x - me.x), sign * (target.y - me.y)
+        return {'ArrowUp': dy < -DEADZONE, 'ArrowDown': dy > DEADZONE,
+                'ArrowLeft': dx < -DEADZONE, 'ArrowRight': dx > DEADZONE}
+
+
+def _nearest(me, players: Iterable, wanted):
+    best, best_d = None, None
+    for p in players:
+        if p is me or not wanted(p):
+            continue
+        d = max(abs(p.x - me.x), abs(p.y - me.y))
+        if best_d is None or d < best_d:
+            best, best_d = p, d
+    return best
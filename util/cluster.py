@@ -0,0 +1,46 @@
+# util/cluster.py
+"""
+Multi-worker mode: every room is pinned to one worker process.
+
+Configured through the environment (all optional; unset = one worker):
+
+    WORKER_URLS    comma-separated public base URLs of every worker, e.g.
+                   http://localhost:8081,http://localhost:8082
+    WORKER_ID      index of this worker in WORKER_URLS
+    MESSAGE_QUEUE  Socket.IO message queue URL shared by all workers
+                   (redis://..., amqp://..., or memory:// for a single
+                   in-process test)
+
+A room's owner is picked by a stable hash of its id.  The room-scoped
+pages (/lobby/<id> and /battlefield?room=<id>) redirect to the owner, so
+team selection, the round system and the battlefield simulation of a
+room always run in the same process.  Lobby-wide emits such as
+room_added/room_removed and leaderboard_updated go through MESSAGE_QUEUE and reach
+clients on every worker.
+"""
+
+import os
+import zlib
+from typing import Optional
+
+WORKER_URLS = [u.strip().rstrip('/') for u in os.environ.get('WORKER_URLS', '').split(',') if u.strip()]
+WORKER_ID = int(os.environ.get('WORKER_ID', 0))
+MESSAGE_QUEUE = os.environ.get('MESSAGE_QUEUE') or None
+
+
+def worker_for_room(room_id: str) -> int:
+    """Index of the worker that owns <room_id> (same answer in every process)."""
+    if not WORKER_URLS:
+        return 0
+    return zlib.crc32(room_id.encode()) % len(WORKER_URLS)
+
+
+def owns_room(room_id: str) -> bool:
+    return not WORKER_URLS or worker_for_room(room_id) == WORKER_ID
+
+
+def room_redirect(room_id: str, full_path: str) -> Optional[str]:
+    """URL of <full_path> on the owning worker, or None when it is us."""
+    if owns_room(room_id):
+        return None
+    return WORKER_URLS[worker_for_room(room_id)] + full_path
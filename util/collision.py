@@ -0,0 +1,226 @@
+# util/collision.py
+"""
+Per-team collision masks for a room, and a batched movement resolver
+that steps every moving player of a room in one pass.
+
+Masks are kept per terrain chunk and built the first time a move
+touches that chunk, so opening a big map costs nothing up front and
+only the chunks players actually walk on are ever compiled.  A chunk
+mask holds one byte per tile with bit <team code> set where that team
+may not stand (walls and the enemy team's safe zone); rows are padded to
+CHUNK_SIZE so edge chunks index like the rest.  With NumPy installed and
+enough movers, resolve_batch() does the whole tick as array operations;
+otherwise it falls back to a plain loop.  Both paths follow the same
+rules as the single-player resolve(), which the client's prediction
+(templates/battlefield.html) mirrors.
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple, Union
+
+from util.terrain import CHUNK_SIZE, Terrain
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# team code → enemy safe-zone tile (players without a team act as red)
+TEAM_INDEX = {'red': 1, 'blue': 2}
+_ENEMY_TILE = {0: 2, 1: 2, 2: 3}
+WALL = 1
+
+# tile → blocked bits, bit <code> set where team <code> may not stand
+_BLOCKED_BITS = bytes(sum(1 << code for code in (0, 1, 2) if v == WALL or v == _ENEMY_TILE[code])
+                      for v in range(256))
+
+# below this many movers the NumPy set-up costs more than it saves
+VECTORIZE_MIN = 16
+
+
+def team_index(team: Optional[str]) -> int:
+    return TEAM_INDEX.get(team, 0)
+
+
+def _step(v: float, d: int, step: float) -> float:
+    return round((v + d*step)*100)/100 if d else v
+
+
+class CollisionMask:
+    __slots__ = ('width', 'height', 'terrain', 'cols', 'chunks',
+                 '_np_chunks', '_np_slot', '_np_used')
+
+    def __init__(self, terrain: Union[Terrain, Sequence[Sequence[int]]]):
+        if not isinstance(terrain, Terrain):
+            terrain = Terrain.from_rows(terrain)
+        self.terrain = terrain
+        self.width = terrain.width
+        self.height = terrain.height
+        self.cols = terrain.chunk_cols
+        # chunk index (cy * cols + cx) → blocked bits, None until first touched
+        self.chunks: List[Optional[bytes]] = [None] * (self.cols * terrain.chunk_rows)
+        self._np_chunks = None
+
+    def _load(self, i: int) -> bytes:
+        """Compile chunk <i>'s mask from its tiles."""
+        cy, cx = divmod(i, self.cols)
+        cw, ch = self.terrain.chunk_dims(cx, cy)
+        bits = self.terrain.chunk(cx, cy).translate(_BLOCKED_BITS)
+        if cw < CHUNK_SIZE or ch < CHUNK_SIZE:
+            pad = bytes(CHUNK_SIZE - cw)
+            bits = b"".join(bits[r * cw:(r + 1) * cw] + pad for r in range(ch))
+            bits += bytes(CHUNK_SIZE * (CHUNK_SIZE - ch))
+        self.chunks[i] = bits
+        return bits
+
+    def _chunk_of(self, x: int, y: int) -> bytes:
+        i = (y // CHUNK_SIZE) * self.cols + x // CHUNK_SIZE
+        bits = self.chunks[i]
+        return self._load(i) if bits is None else bits
+
+    def _bits(self, x: int, y: int) -> int:
+        return self._chunk_of(x, y)[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+
+    def blocked(self, code: int, x: int, y: int) -> bool:
+        return (self._bits(x, y) >> code) & 1 == 1
+
+    # ─── single player ──────────────────────────────────
+    def resolve(self, x: float, y: float, dx: int, dy: int, code: int,
+                step: float) -> Optional[Tuple[float, float]]:
+        """One step for one player; None when pushed off the map on both axes."""
+        w, h = self.width, self.height
+        new_x, new_y = _step(x, dx, step), _step(y, dy, step)
+
+        x_out = not 0 <= new_x <= w-1
+        y_out = not 0 <= new_y <= h-1
+        if x_out and y_out:
+            return None
+        if x_out:
+            new_x = min(max(new_x, 0), w-1)
+        if y_out:
+            new_y = min(max(new_y, 0), h-1)
+
+        fx = math.floor(new_x)
+        cx = math.ceil(new_x)
+        fy = math.floor(new_y)
+        cy = math.ceil(new_y)
+
+        bit = 1 << code
+        chunk_x, lx = divmod(fx, CHUNK_SIZE)
+        chunk_y, ly = divmod(fy, CHUNK_SIZE)
+        if lx < CHUNK_SIZE - 1 and ly < CHUNK_SIZE - 1:
+            # all four corners in one chunk (the usual case)
+            n = chunk_y * self.cols + chunk_x
+            bits = self.chunks[n] or self._load(n)
+            i = ly * CHUNK_SIZE + lx
+            down = (cy - fy) * CHUNK_SIZE
+            tl = bits[i] & bit
+            tr = bits[i + cx - fx] & bit
+            bl = bits[i + down] & bit
+            br = bits[i + down + cx - fx] & bit
+        else:
+            tl = self._bits(fx, fy) & bit
+            tr = self._bits(cx, fy) & bit
+            bl = self._bits(fx, cy) & bit
+            br = self._bits(cx, cy) & bit
+
+        res_x, res_y = new_x, new_y
+        if new_x != x and fx != cx:
+            if (new_x < x and (tl or bl)) or (new_x > x and (tr or br)):
+                res_x = x
+        if new_y != y and fy != cy:
+            if (new_y > y and (bl or br)) or (new_y < y and (tl or tr)):
+                res_y = y
+        return res_x, res_y
+
+    # ─── whole room ─────────────────────────────────────
+    def resolve_batch(self, xs: Sequence[float], ys: Sequence[float],
+                      dxs: Sequence[int], dys: Sequence[int],
+                      codes: Sequence[int], step: float):
+        """
+        Step every player at once.  Returns (new_xs, new_ys, ok) as Python
+        lists; ok[i] is False where resolve() would have returned None.
+        """
+        if np is not None and len(xs) >= VECTORIZE_MIN:
+            return self._resolve_numpy(xs, ys, dxs, dys, codes, step)
+
+        new_xs, new_ys, ok = [], [], []
+        for x, y, dx, dy, code in zip(xs, ys, dxs, dys, codes):
+            res = self.resolve(x, y, dx, dy, code, step)
+            if res is None:
+                new_xs.append(x)
+                new_ys.append(y)
+                ok.append(False)
+            else:
+                new_xs.append(res[0])
+                new_ys.append(res[1])
+                ok.append(True)
+        return new_xs, new_ys, ok
+
+    def _np_bits(self, xs, ys):
+        """Blocked bits at integer tile arrays <xs>, <ys>, loading chunks as needed."""
+        if self._np_chunks is None:
+            # compiled chunks are copied into rows of one growing array;
+            # _np_slot maps a chunk index to its row (-1: not copied yet)
+            self._np_chunks = np.zeros((16, CHUNK_SIZE * CHUNK_SIZE), dtype=np.uint8)
+            self._np_slot = np.full(len(self.chunks), -1, dtype=np.intp)
+            self._np_used = 0
+        idx = (ys // CHUNK_SIZE) * self.cols + xs // CHUNK_SIZE
+        slots = self._np_slot[idx]
+        missing = slots < 0
+        if missing.any():
+            for i in np.unique(idx[missing]).tolist():
+                bits = self.chunks[i]
+                if bits is None:
+                    bits = self._load(i)
+                if self._np_used == len(self._np_chunks):
+                    self._np_chunks = np.concatenate([self._np_chunks, np.zeros_like(self._np_chunks)])
+                self._np_chunks[self._np_used] = np.frombuffer(bits, dtype=np.uint8)
+                self._np_slot[i] = self._np_used
+                self._np_used += 1
+            slots = self._np_slot[idx]
+        return self._np_chunks[slots, (ys % CHUNK_SIZE) * CHUNK_SIZE + xs % CHUNK_SIZE]
+
+    def _resolve_numpy(self, xs, ys, dxs, dys, codes, step):
+        w, h = self.width, self.height
+
+        x = np.asarray(xs, dtype=np.float64)
+        y = np.asarray(ys, dtype=np.float64)
+        dx = np.asarray(dxs, dtype=np.int8)
+        dy = np.asarray(dys, dtype=np.int8)
+        code = np.asarray(codes, dtype=np.intp)
+
+        nx = np.where(dx != 0, np.round((x + dx*step)*100)/100, x)
+        ny = np.where(dy != 0, np.round((y + dy*step)*100)/100, y)
+
+        x_out = (nx < 0) | (nx > w-1)
+        y_out = (ny < 0) | (ny > h-1)
+        ok = ~(x_out & y_out)
+        nx = np.clip(nx, 0, w-1)
+        ny = np.clip(ny, 0, h-1)
+
+        fx = np.floor(nx).astype(np.intp)
+        cx = np.ceil(nx).astype(np.intp)
+        fy = np.floor(ny).astype(np.intp)
+        cy = np.ceil(ny).astype(np.intp)
+
+        # all four corners in one gather
+        corners = self._np_bits(np.concatenate([fx, cx, fx, cx]), np.concatenate([fy, fy, cy, cy]))
+        bit = np.left_shift(1, code).astype(np.uint8)
+        tl, tr, bl, br = ((c & bit) != 0 for c in np.split(corners, 4))
+
+        block_x = (nx != x) & (fx != cx) & (((nx < x) & (tl | bl)) | ((nx > x) & (tr | br)))
+        block_y = (ny != y) & (fy != cy) & (((ny > y) & (bl | br)) | ((ny < y) & (tl | tr)))
+        rx = np.where(block_x, x, nx)
+        ry = np.where(block_y, y, ny)
+
+        rx = np.where(ok, rx, x)
+        ry = np.where(ok, ry, y)
+        return rx.tolist(), ry.tolist(), ok.tolist()
+
+
+def key_direction(keys: dict) -> Tuple[int, int]:
+    """Client keyState → (dx, dy) in {-1, 0, 1}."""
+    dx = (1 if keys.get('ArrowRight') else 0) - (1 if keys.get('ArrowLeft') else 0)
+    dy = (1 if keys.get('ArrowDown') else 0) - (1 if keys.get('ArrowUp') else 0)
+    return dx, dy
@@ -1,17 +1,70 @@
 import os
-from pymongo import MongoClient
+import logging
+from pymongo import MongoClient, ASCENDING, DESCENDING
 
 # Check if running inside Docker
 docker_db = os.environ.get('DOCKER_DB', "false").lower() == "true"
 
 # Set up MongoDB connection string
 if docker_db:
-    mongo_client = MongoClient("mongodb://mongo:27017")  # docker-compose service name
+    mongo_uri = "mongodb://mongo:27017"  # docker-compose service name
 else:
-    mongo_client = MongoClient("mongodb://localhost:27017")
+    mongo_uri = "mongodb://localhost:27017"
+
+# Connection pool settings
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+MONGO_MAX_IDLE_MS = int(os.environ.get('MONGO_MAX_IDLE_MS', 60000))
+MONGO_TIMEOUT_MS = int(os.environ.get('MONGO_TIMEOUT_MS', 5000))
+
+# Debug query profiling: slow-query + explain() logging per socket event
+MONGO_PROFILE = os.environ.get('MONGO_PROFILE', "false").lower() == "true"
+MONGO_SLOW_MS = float(os.environ.get('MONGO_SLOW_MS', 50))
+
+DB_NAME = "mmo_game"
+
+# /metrics attaches its command listener globally (util.metrics.watch_mongo)
+listeners = []
+profiler = None
+if MONGO_PROFILE:
+    from util.db_profile import QueryProfiler, start_summary_logger
+    profiler = QueryProfiler(lambda: mongo_client, DB_NAME, MONGO_SLOW_MS)
+    listeners.append(profiler)
+    start_summary_logger(profiler)
+
+mongo_client = MongoClient(
+    mongo_uri,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+    event_listeners=listeners,
+)
 
 # Access the database and collections
-db = mongo_client["mmo_game"]
+db = mongo_client[DB_NAME]
 user_collection = db["users"]
 chat_collection = db["chat"]
-room_collection = db["rooms"]
\ No newline at end of file
+room_collection = db["rooms"]
+
+# Indexes for every hot query: (collection, keys, options)
+INDEXES = [
+    (room_collection, [("id", ASCENDING)], {"unique": True}),
+    (room_collection, [("players.id", ASCENDING)], {}),
+    (room_collection, [("game_started", ASCENDING)], {}),
+    (room_collection, [("red_team", ASCENDING)], {}),
+    (room_collection, [("blue_team", ASCENDING)], {}),
+    (room_collection, [("no_team", ASCENDING)], {}),
+    (user_collection, [("username", ASCENDING)], {"unique": True}),
+    (user_collection, [("auth_token", ASCENDING)], {}),
+    (user_collection, [("wins", DESCENDING), ("username", ASCENDING)], {}),
+]
+
+
+def ensure_indexes():
+    """Create any missing index from INDEXES (a no-op for existing ones)."""
+    for collection, keys, options in INDEXES:
+        try:
+            collection.create_index(keys, **options)
+        except Exception:
+            logging.exception(f"Could not ensure index {keys} on {collection.name}")
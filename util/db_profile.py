@@ -0,0 +1,134 @@
+# util/db_profile.py
+"""
+Debug-mode Mongo query profiler (MONGO_PROFILE=true).
+
+A pymongo CommandListener that times every command and attributes it to
+the socket event ("/battlefield move") or HTTP route ("GET /lobby") it
+ran under.  Commands slower than MONGO_SLOW_MS are logged, and the first
+slow occurrence of each (event, collection, filter shape) also gets its
+explain() query plan logged, so collection scans stand out.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+from pymongo import monitoring
+
+# fields pymongo adds to every command that explain() must not see
+_SESSION_FIELDS = {'lsid', '$db', '$clusterTime', 'txnNumber', '$readPreference'}
+_EXPLAINABLE = {'find', 'count', 'distinct', 'aggregate', 'update', 'delete', 'findAndModify'}
+
+logger = logging.getLogger('mongo.profile')
+
+
+def current_event() -> str:
+    """Socket event or HTTP route being handled by this green thread, if any."""
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return '-'
+    if not has_request_context():
+        return 'background'
+    event = getattr(request, 'event', None)
+    if event:
+        return f"{getattr(request, 'namespace', '')} {event.get('message')}"
+    return f"{request.method} {request.path}"
+
+
+def _shape(value):
+    """Filter with the values blanked out: {'id': 1} and {'id': 2} share a shape."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _shape(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_shape(v) for v in value[:1])
+    return '?'
+
+
+class QueryProfiler(monitoring.CommandListener):
+    def __init__(self, client_ref, db_name: str, slow_ms: float):
+        self._client_ref = client_ref          # () → MongoClient, set after construction
+        self._db_name = db_name
+        self.slow_ms = slow_ms
+        self._pending: Dict[int, Tuple[str, dict]] = {}
+        self._explained = set()
+        self._lock = threading.Lock()
+        # event → [count, total_ms]
+        self.per_event: Dict[str, list] = {}
+
+    def started(self, event):
+        if event.command_name == 'explain':
+            return
+        with self._lock:
+            self._pending[event.request_id] = (current_event(), event.command)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed):
+        with self._lock:
+            pending = self._pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        source, command = pending
+        ms = event.duration_micros / 1000.0
+
+        with self._lock:
+            stats = self.per_event.setdefault(source, [0, 0.0])
+            stats[0] += 1
+            stats[1] += ms
+
+        if ms < self.slow_ms and not failed:
+            return
+
+        collection = command.get(event.command_name)
+        flt = command.get('filter', command.get('q', command.get('query')))
+        logger.warning(f"slow mongo {event.command_name} on {collection} took {ms:.1f} ms "
+                       f"during [{source}] filter={flt}{' (failed)' if failed else ''}")
+
+        if event.command_name in _EXPLAINABLE:
+            key = (source, collection, _shape(flt))
+            with self._lock:
+                if key in self._explained:
+                    return
+                self._explained.add(key)
+            cmd = {k: v for k, v in command.items() if k not in _SESSION_FIELDS}
+            threading.Thread(target=self._explain, args=(source, cmd), daemon=True).start()
+
+    def _explain(self, source, cmd):
+        try:
+            db = self._client_ref()[self._db_name]
+            plan = db.command('explain', cmd, verbosity='queryPlanner')
+            winning = plan.get('queryPlanner', {}).get('winningPlan', {})
+            logger.warning(f"explain [{source}] {cmd.get(next(iter(cmd)))}: {_summarise(winning)}")
+        except Exception:
+            logger.exception(f"explain failed for [{source}]")
+
+
+def _summarise(plan: dict) -> str:
+    """'FETCH <- IXSCAN {id: 1}' style summary of a winning plan."""
+    stages = []
+    while plan:
+        stage = plan.get('stage', '?')
+        if 'keyPattern' in plan:
+            stage += f" {plan['keyPattern']}"
+        stages.append(stage)
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+    return ' <- '.join(stages)
+
+
+def start_summary_logger(profiler: QueryProfiler, interval_sec: float = 60) -> None:
+    """Periodically log Mongo call counts and time per event."""
+    def _loop():
+        while True:
+            time.sleep(interval_sec)
+            with profiler._lock:
+                rows = sorted(profiler.per_event.items(), key=lambda kv: kv[1][1], reverse=True)
+                profiler.per_event.clear()
+            for source, (count, total_ms) in rows:
+                logger.info(f"mongo per event [{source}]: {count} calls, {total_ms:.1f} ms")
+    threading.Thread(target=_loop, daemon=True).start()
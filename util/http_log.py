@@ -0,0 +1,131 @@
+# util/http_log.py
+"""
+Non-blocking, sampled request/response logging.
+
+Request handlers only put records on an in-memory queue; a background
+QueueListener does the file writes to logs/server.log and
+logs/raw_http.log.  The raw HTTP log is sampled per route and status,
+static assets are never captured, and request/response bodies are only
+read for failed responses unless RAW_LOG_SUCCESS_BODIES is set.
+"""
+
+import os
+import queue
+import random
+import logging
+import logging.handlers
+
+# ─── Tunables ────────────────────────────────────────────
+# fraction of successful (< 400) exchanges written to the raw log
+SUCCESS_SAMPLE_RATE = float(os.environ.get('RAW_LOG_SAMPLE_SUCCESS', 0.1))
+# fraction of failed (>= 400) exchanges written to the raw log
+ERROR_SAMPLE_RATE = float(os.environ.get('RAW_LOG_SAMPLE_ERROR', 1.0))
+# also capture bodies of successful exchanges (slow, debugging only)
+CAPTURE_SUCCESS_BODIES = os.environ.get('RAW_LOG_SUCCESS_BODIES', 'false').lower() == 'true'
+BODY_PREVIEW_BYTES = 2048
+
+
+def _parse_route_rates(spec: str) -> dict:
+    """'/api/leaderboard=0.05,/lobby=0.5' → {'/api/leaderboard': 0.05, '/lobby': 0.5}"""
+    rates = {}
+    for item in filter(None, (s.strip() for s in spec.split(','))):
+        prefix, _, rate = item.partition('=')
+        try:
+            rates[prefix] = float(rate)
+        except ValueError:
+            continue
+    return rates
+
+
+# per-route-prefix overrides of the success rate (longest prefix wins)
+ROUTE_SAMPLE_RATES = _parse_route_rates(os.environ.get('RAW_LOG_SAMPLE_ROUTES', ''))
+
+raw_logger = logging.getLogger('raw')
+_listener = None
+_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+
+def setup_logging(log_dir: str = 'logs') -> None:
+    """Route the root and raw loggers through one queue to a background writer."""
+    global _listener
+    if _listener is not None:
+        return
+    os.makedirs(log_dir, exist_ok=True)
+
+    server_handler = logging.FileHandler(os.path.join(log_dir, 'server.log'))
+    server_handler.setFormatter(logging.Formatter(_FORMAT, datefmt=_DATEFMT))
+    raw_handler = logging.FileHandler(os.path.join(log_dir, 'raw_http.log'))
+    raw_handler.setFormatter(logging.Formatter(_FORMAT))
+    raw_handler.addFilter(lambda record: record.name == 'raw')
+    server_handler.addFilter(lambda record: record.name != 'raw')
+
+    # queue.Queue (not SimpleQueue) so the listener blocks cooperatively under eventlet
+    log_queue = queue.Queue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+
+    raw_logger.setLevel(logging.INFO)
+    raw_logger.propagate = False
+    raw_logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, server_handler, raw_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+
+
+def sample_rate(path: str, status: int) -> float:
+    if status >= 400:
+        return ERROR_SAMPLE_RATE
+    best, rate = -1, SUCCESS_SAMPLE_RATE
+    for prefix, r in ROUTE_SAMPLE_RATES.items():
+        if path.startswith(prefix) and len(prefix) > best:
+            best, rate = len(prefix), r
+    return rate
+
+
+def log_exchange(request, response, username: str) -> None:
+    ip = request.remote_addr
+    method = request.method
+    path = request.path
+    status = response.status_code
+
+    logging.info(f"{ip} - {username} - {method} {path} → {status}")
+
+    # fast path: static assets are never captured
+    if request.endpoint == 'static':
+        return
+
+    rate = sample_rate(path, status)
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+
+    if status < 400 and not CAPTURE_SUCCESS_BODIES:
+        raw_logger.info(f"EXCHANGE: {method} {path} from {ip} → {status} (bodies not captured)")
+        return
+
+    # Raw request logging (limit to 2048 bytes, redact sensitive info)
+    if request.content_type and 'multipart' in request.content_type:
+        raw_logger.info(f"REQUEST: {method} {path} from {ip} — multipart form (headers only)")
+    else:
+        headers = dict(request.headers)
+        headers.pop('Cookie', None)  # Remove cookies
+        sanitized_headers = {k: v for k, v in headers.items() if 'auth_token' not in v.lower()}
+        body_preview = request.get_data()[:BODY_PREVIEW_BYTES].decode(errors='replace') if request.data else ''
+        raw_logger.info(f"REQUEST: {method} {path} from {ip}\nHeaders: {sanitized_headers}\nBody:\n{body_preview}")
+
+    if response.direct_passthrough or (response.content_type and not response.content_type.startswith('text')):
+        raw_logger.info(f"RESPONSE: {method} {path} → {status} — {response.content_type} (not logged)")
+        return
+    try:
+        preview = response.get_data(as_text=True)[:BODY_PREVIEW_BYTES]
+    except Exception:
+        preview = "[Could not decode response body]"
+    raw_logger.info(
+        f"RESPONSE: {method} {path} → {status}\n"
+        f"Headers: {dict(response.headers)}\n"
+        f"Body:\n{preview}"
+    )
@@ -0,0 +1,70 @@
+# util/input_limiter.py
+"""
+Per-connection token bucket in front of the battlefield `move` handler.
+
+Each sid may send INPUT_RATE inputs per second with bursts of up to
+INPUT_BURST; anything above that is dropped before it reaches the
+ticker, so a client on a 240 Hz monitor costs the server no more than
+one on 60 Hz.  Predicting clients learn about a dropped input from the
+next ack (util/ticker.py); for clients without sequence numbers the
+ticker also merges queued inputs into the latest one.  The counters feed
+the metrics endpoint.
+"""
+
+import os
+import time
+from typing import Dict
+
+from eventlet.semaphore import Semaphore
+
+from util.ticker import TICK_RATE
+
+# ─── Tunables ────────────────────────────────────────────
+# a little above the tick rate so clock drift between client and server
+# never costs an honest client an input
+INPUT_RATE = float(os.environ.get('INPUT_RATE', TICK_RATE * 1.25))   # inputs per second
+INPUT_BURST = float(os.environ.get('INPUT_BURST', TICK_RATE / 2))    # bucket size
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, now: float):
+        self.tokens = INPUT_BURST
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(INPUT_BURST, self.tokens + (now - self.updated) * INPUT_RATE)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# ─── In-memory state ────────────────────────────────────
+_buckets: Dict[str, TokenBucket] = {}      # sid → bucket
+counters = {'accepted': 0, 'dropped': 0, 'coalesced': 0}
+_lock = Semaphore()
+
+
+def allow(sid: str) -> bool:
+    """Spend one token for <sid>; False (and counted as dropped) when empty."""
+    now = time.monotonic()
+    with _lock:
+        bucket = _buckets.get(sid)
+        if bucket is None:
+            bucket = _buckets[sid] = TokenBucket(now)
+        ok = bucket.take(now)
+        counters['accepted' if ok else 'dropped'] += 1
+    return ok
+
+
+def note_coalesced() -> None:
+    with _lock:
+        counters['coalesced'] += 1
+
+
+def forget(sid: str) -> None:
+    with _lock:
+        _buckets.pop(sid, None)
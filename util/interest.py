@@ -0,0 +1,129 @@
+# util/interest.py
+"""
+Area-of-interest filtering for battlefield movement updates.
+
+The map is divided into coarse interest cells of AOI_CELL tiles.  Each
+connection is interested in the 3x3 block of cells around its own
+player, which always covers the visible viewport, and only receives the
+movers inside that block.  When a viewer crosses into another cell it
+gets one snapshot of every player in its new block, so nobody it can
+see is shown at a stale position.  Players that drop out of a viewer's
+block, because either of them moved, are listed once in that viewer's
+`players_out_of_view` so the client stops drawing them where they were
+last seen.
+
+Rooms with fewer than AOI_MIN_PLAYERS players keep the single
+room-wide broadcast: there everyone is close to everyone anyway.  Rooms
+in AOI mode also get a coarse `minimap` summary every
+MINIMAP_INTERVAL_SEC instead of full-rate positions for the whole map.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from eventlet.semaphore import Semaphore
+
+from util.protocol import FLAG_DEAD, TEAM_CODES
+
+# ─── Tunables ────────────────────────────────────────────
+AOI_CELL = float(os.environ.get('AOI_CELL', 16))               # tiles per interest cell
+AOI_MIN_PLAYERS = int(os.environ.get('AOI_MIN_PLAYERS', 16))
+MINIMAP_INTERVAL_SEC = float(os.environ.get('MINIMAP_INTERVAL', 1.0))
+
+Cell = Tuple[int, int]
+
+# ─── In-memory state ────────────────────────────────────
+_viewer_cells: Dict[str, Cell] = {}     # sid → interest cell it was last sent
+_viewer_seen: Dict[str, Set[str]] = {}  # sid → players in its block, as last sent
+_minimap_due: Dict[str, float] = {}     # room_id → next minimap summary
+_lock = Semaphore()
+
+
+def enabled(state) -> bool:
+    return len(state.players) >= AOI_MIN_PLAYERS
+
+
+def cell_of(x: float, y: float) -> Cell:
+    return int(x // AOI_CELL), int(y // AOI_CELL)
+
+
+def _block(cell: Cell) -> Iterator[Cell]:
+    cx, cy = cell
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            yield cx + dx, cy + dy
+
+
+def plan(state, updated: Iterable, viewers: Iterable[Tuple[str, str, str]]):
+    """
+    Yield (sid, fmt, records, left) for every viewer with something to see.
+
+    <updated> are this tick's PlayerRecords; <viewers> come from
+    protocol.viewers().  <left> are the ids that moved out of the
+    viewer's block since its last update.  Viewers without a player in
+    the room (spectators) get every update.
+    """
+    updated = list(updated)
+    buckets: Dict[Cell, List] = {}
+    updated_cells: Dict[str, Cell] = {}
+    for record in updated:
+        cell = updated_cells[record.id] = cell_of(record.x, record.y)
+        buckets.setdefault(cell, []).append(record)
+
+    for sid, fmt, player in viewers:
+        me = state.players.get(player)
+        if me is None:
+            if updated:
+                yield sid, fmt, updated, []
+            continue
+
+        cell = cell_of(me.x, me.y)
+        block = set(_block(cell))
+        with _lock:
+            moved_cell = _viewer_cells.get(sid) != cell
+            _viewer_cells[sid] = cell
+            seen = _viewer_seen.setdefault(sid, set())
+        if moved_cell:
+            # entered a new block: everyone in it, moving or not
+            records = [p for p in state.players.values() if cell_of(p.x, p.y) in block]
+            ids = {p.id for p in records}
+            left = [pid for pid in seen if pid not in ids and pid in state.players]
+            seen.clear()
+            seen.update(ids)
+        else:
+            records = [r for c in block for r in buckets.get(c, ())]
+            seen.update(r.id for r in records)
+            # only this tick's movers can have left a block that stayed put
+            left = [pid for pid in seen if updated_cells.get(pid, cell) not in block]
+            seen.difference_update(left)
+        if records or left:
+            yield sid, fmt, records, left
+
+
+def forget(sid: str) -> None:
+    with _lock:
+        _viewer_cells.pop(sid, None)
+        _viewer_seen.pop(sid, None)
+
+
+def minimap_due(room_id: str) -> bool:
+    now = time.monotonic()
+    with _lock:
+        if now < _minimap_due.get(room_id, 0.0):
+            return False
+        _minimap_due[room_id] = now + MINIMAP_INTERVAL_SEC
+    return True
+
+
+def encode_minimap(state) -> List[int]:
+    """Flat [x, y, flags, ...] with whole-tile positions; flags as in protocol keyframes."""
+    out = []
+    for p in state.players.values():
+        out.extend((int(p.x), int(p.y), TEAM_CODES.get(p.team, 0) | (0 if p.alive else FLAG_DEAD)))
+    return out
+
+
+def drop_room(room_id: str) -> None:
+    with _lock:
+        _minimap_due.pop(room_id, None)
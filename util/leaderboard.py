@@ -0,0 +1,124 @@
+# util/leaderboard.py
+"""
+Cached, incrementally maintained top-K leaderboard.
+
+The top LEADERBOARD_TOP_K users by wins are loaded once with an indexed
+sort and then patched in place whenever _end_round awards wins, so
+serving the leaderboard costs no Mongo traffic.  Every change bumps a
+version number that becomes the response ETag; lobby clients that
+refetch after `leaderboard_updated` mostly get a 304.  Pages beyond the
+top K and rank lookups for users outside it fall back to Mongo, and
+those pages are sent without an ETag.
+"""
+
+import os
+import time
+from typing import Dict, List, Optional
+
+from eventlet.semaphore import Semaphore
+
+# ─── Tunables ────────────────────────────────────────────
+LEADERBOARD_TOP_K = int(os.environ.get('LEADERBOARD_TOP_K', 100))
+# reload from Mongo at most this stale (picks up writes by other workers)
+LEADERBOARD_TTL_SEC = float(os.environ.get('LEADERBOARD_TTL', 30))
+
+_SORT = [("wins", -1), ("username", 1)]
+_FIELDS = {"_id": 0, "username": 1, "wins": 1}
+
+# ─── In-memory state ────────────────────────────────────
+_top: List[Dict] = []          # [{"username", "wins"}] best first
+_loaded_at = 0.0
+version = 0
+_lock = Semaphore()
+
+
+def _sort_key(entry):
+    return -entry["wins"], entry["username"]
+
+
+def _load(user_coll) -> None:
+    global _top, _loaded_at, version
+    docs = user_coll.find({}, _FIELDS).sort(_SORT).limit(LEADERBOARD_TOP_K)
+    top = [{"username": d["username"], "wins": d.get("wins", 0)} for d in docs]
+    with _lock:
+        if top != _top:
+            version += 1
+        _top = top
+        _loaded_at = time.monotonic()
+
+
+def _ensure_fresh(user_coll) -> None:
+    if not _loaded_at or time.monotonic() - _loaded_at > LEADERBOARD_TTL_SEC:
+        _load(user_coll)
+
+
+def current_version(user_coll) -> int:
+    _ensure_fresh(user_coll)
+    return version
+
+
+def is_cached(offset: int, limit: int) -> bool:
+    """
+    Whether page(offset, limit) is served from the cached top K.  Only
+    those pages follow `version`; the rest come from Mongo and can change
+    without it moving, so they get no ETag.
+    """
+    with _lock:
+        return offset + limit <= len(_top) or len(_top) < LEADERBOARD_TOP_K
+
+
+def page(user_coll, offset: int, limit: int) -> List[Dict]:
+    """Users ranked offset .. offset+limit-1, best first."""
+    _ensure_fresh(user_coll)
+    if is_cached(offset, limit):
+        with _lock:
+            return _top[offset:offset + limit]
+
+    # beyond the cached top K: ask Mongo for the rest of the page
+    docs = user_coll.find({}, _FIELDS).sort(_SORT).skip(offset).limit(limit)
+    return [{"username": d["username"], "wins": d.get("wins", 0)} for d in docs]
+
+
+def rank_of(user_coll, username: str) -> Optional[Dict]:
+    """{"username", "wins", "rank"} (1 = best, ties share a rank), or None."""
+    _ensure_fresh(user_coll)
+    with _lock:
+        top = list(_top)
+    for entry in top:
+        if entry["username"] == username:
+            rank = 1 + sum(1 for e in top if e["wins"] > entry["wins"])
+            return {**entry, "rank": rank}
+
+    doc = user_coll.find_one({"username": username}, _FIELDS)
+    if not doc:
+        return None
+    wins = doc.get("wins", 0)
+    better = user_coll.count_documents({"wins": {"$gt": wins}})
+    return {"username": username, "wins": wins, "rank": better + 1}
+
+
+def record_wins(new_totals: Dict[str, int]) -> None:
+    """Patch the cached top K with {username: wins after the $inc}."""
+    global _top, version
+    if not _loaded_at:
+        return  # nothing cached yet; the first read loads fresh data
+    with _lock:
+        top = [e for e in _top if e["username"] not in new_totals]
+        top.extend({"username": u, "wins": w} for u, w in new_totals.items())
+        top.sort(key=_sort_key)
+        # a user who was below the cut-off can only enter if they beat it,
+        # which keeps the trimmed list exact
+        _top = top[:LEADERBOARD_TOP_K]
+        version += 1
+
+
+def note_new_user(username: str) -> None:
+    """A freshly registered user (0 wins) shows up while the top K has room."""
+    global version
+    if not _loaded_at:
+        return
+    with _lock:
+        if len(_top) < LEADERBOARD_TOP_K:
+            _top.append({"username": username, "wins": 0})
+            _top.sort(key=_sort_key)
+            version += 1
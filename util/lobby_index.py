@@ -0,0 +1,67 @@
+# util/lobby_index.py
+"""
+In-memory index of open (not yet started) rooms for the lobby.
+
+Built from Mongo once, then kept current by create_room / start_game /
+room deletion, so listing rooms never scans the rooms collection.
+Lobby clients fetch a paged `room_list` snapshot once and afterwards
+only receive `room_added` / `room_removed` deltas.  Room names are
+HTML-escaped once, on insert.
+"""
+
+import html
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from eventlet.semaphore import Semaphore
+
+from util import cluster
+
+ROOM_PAGE_SIZE = 50
+# with several workers, rooms created elsewhere only reach our index on reload
+LOBBY_INDEX_TTL_SEC = 10
+
+_rooms: "OrderedDict[str, Dict]" = OrderedDict()    # room_id → {"id", "name"}
+_loaded_at = 0.0
+_lock = Semaphore()
+
+
+def _entry(room_id: str, room_name: str) -> Dict:
+    return {"id": str(room_id), "name": html.escape(room_name)}
+
+
+def _ensure_loaded(room_collection) -> None:
+    global _loaded_at
+    if _loaded_at and not (cluster.WORKER_URLS and
+                           time.monotonic() - _loaded_at > LOBBY_INDEX_TTL_SEC):
+        return
+    docs = room_collection.find({"game_started": False}, {"_id": 0, "id": 1, "room_name": 1})
+    fresh = OrderedDict((d["id"], _entry(d["id"], d["room_name"])) for d in docs)
+    with _lock:
+        _rooms.clear()
+        _rooms.update(fresh)
+        _loaded_at = time.monotonic()
+
+
+def add_room(room_collection, room_id: str, room_name: str) -> Dict:
+    _ensure_loaded(room_collection)
+    entry = _entry(room_id, room_name)
+    with _lock:
+        _rooms[entry["id"]] = entry
+    return entry
+
+
+def remove_room(room_id: str) -> bool:
+    """Drop <room_id>; True if it was listed."""
+    with _lock:
+        return _rooms.pop(room_id, None) is not None
+
+
+def snapshot(room_collection, offset: int = 0, limit: int = ROOM_PAGE_SIZE) -> Dict:
+    _ensure_loaded(room_collection)
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), ROOM_PAGE_SIZE)
+    with _lock:
+        rooms = list(_rooms.values())
+    return {"rooms": rooms[offset:offset + limit], "offset": offset, "total": len(rooms)}
@@ -0,0 +1,253 @@
+# util/match_log.py
+"""
+Compact binary log of every match's inputs, for deterministic replay.
+
+From kick-off to match over, each room appends to
+MATCH_LOG_DIR/<room_id>-<start>.mlog everything that changes its state
+from outside the rules: the starting snapshot, each tick's applied
+inputs, joins and disconnects, tagger flips from util/rounds.py and
+respawn batches.  Round ends are logged with the winner, team counts and
+a digest of every player's position, team and alive flag, so
+tools/replay.py can re-run the log through util/simulation.py and check
+it arrives at the same state.
+
+File layout: MAGIC, then records of
+    <B kind> <I ms since start> <I payload length> payload
+with the payloads described next to each encoder below.  Writes are
+buffered per room and appended every MATCH_LOG_FLUSH_BYTES and when the
+match ends.
+
+Recording is off unless MATCH_LOG=true.  When on, only the newest
+MATCH_LOG_KEEP logs are kept; older ones are deleted as matches start.
+"""
+
+import base64
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+from util.protocol import TEAM_CODES
+from util.ticker import MOVE_STEP, TICK_RATE
+
+# ─── Tunables ────────────────────────────────────────────
+MATCH_LOG_ENABLED = os.environ.get('MATCH_LOG', 'false').lower() == 'true'
+MATCH_LOG_DIR = os.environ.get('MATCH_LOG_DIR', os.path.join('logs', 'matches'))
+MATCH_LOG_KEEP = int(os.environ.get('MATCH_LOG_KEEP', 200))    # newest logs kept on disk
+MATCH_LOG_FLUSH_BYTES = int(os.environ.get('MATCH_LOG_FLUSH_BYTES', 16384))
+
+MAGIC = b'MLOG\x01'
+START, TICK, JOIN, LEAVE, TAGGERS, RESPAWN, ROUND_END = range(1, 8)
+
+_HEADER = struct.Struct('<BII')
+_U16 = struct.Struct('<H')
+_ENTRY = struct.Struct('<HB')                 # player idx, count / team code
+_ROUND_END = struct.Struct('<BBHHI')          # round, winner code, red, blue, digest
+
+KEY_BITS = (('ArrowUp', 1), ('ArrowDown', 2), ('ArrowLeft', 4), ('ArrowRight', 8))
+TEAM_NAMES = {code: team for team, code in TEAM_CODES.items()}
+
+
+class MatchLog:
+    __slots__ = ('path', 'started', 'buf')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.monotonic()
+        self.buf = bytearray(MAGIC)
+
+    def append(self, kind: int, payload: bytes) -> None:
+        ms = int((time.monotonic() - self.started) * 1000)
+        self.buf += _HEADER.pack(kind, ms, len(payload))
+        self.buf += payload
+        if len(self.buf) >= MATCH_LOG_FLUSH_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buf:
+            return
+        try:
+            with open(self.path, 'ab') as out:
+                out.write(self.buf)
+        except OSError:
+            logging.exception(f"Could not write match log {self.path}")
+        self.buf.clear()
+
+
+# ─── In-memory state:  room_id → open log ───────────────
+_logs: Dict[str, MatchLog] = {}
+
+
+def begin(state) -> Optional[str]:
+    """Start logging <state>'s match; returns the log path."""
+    if not MATCH_LOG_ENABLED:
+        return None
+    close(state.id)
+    os.makedirs(MATCH_LOG_DIR, exist_ok=True)
+    _prune(MATCH_LOG_KEEP - 1)
+    path = os.path.join(MATCH_LOG_DIR, f"{state.id}-{time.strftime('%Y%m%d-%H%M%S')}.mlog")
+    log = _logs[state.id] = MatchLog(path)
+
+    spec = state.terrain.spec() if state.terrain else None
+    if spec and 'tiles' in spec:
+        spec = dict(spec, tiles=base64.b64encode(spec['tiles']).decode())
+    snapshot = {
+        'room': state.id,
+        'tick_rate': TICK_RATE,
+        'move_step': MOVE_STEP,
+        'attacking_team': state.attacking_team,
+        'map': spec,
+        'players': [{'id': p.id, 'idx': p.idx, 'x': p.x, 'y': p.y, 'team': p.team,
+                     'is_tagger': p.is_tagger}
+                    for p in sorted(state.players.values(), key=lambda p: p.idx)],
+    }
+    log.append(START, json.dumps(snapshot).encode())
+    return path
+
+
+def _prune(keep: int) -> None:
+    """Delete all but the <keep> most recently written logs; open ones are left alone."""
+    open_paths = {log.path for log in _logs.values()}
+    try:
+        paths = [os.path.join(MATCH_LOG_DIR, name) for name in os.listdir(MATCH_LOG_DIR)
+                 if name.endswith('.mlog')]
+        paths = [p for p in paths if p not in open_paths]
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:max(len(paths) - keep, 0)]:
+            os.remove(path)
+    except OSError:
+        logging.exception(f"Could not prune match logs in {MATCH_LOG_DIR}")
+
+
+def close(room_id: str) -> None:
+    log = _logs.pop(room_id, None)
+    if log is not None:
+        log.flush()
+
+
+# ─── Recorders (no-ops for rooms without an open log) ───
+def record_tick(state, inputs) -> None:
+    """<H n> then per player <H idx><B count> and <count> key-bit bytes."""
+    log = _logs.get(state.id)
+    if log is None:
+        return
+    out = bytearray()
+    n = 0
+    for player, player_inputs in inputs.items():
+        record = state.players.get(player)
+        if record is None:
+            continue
+        out += _ENTRY.pack(record.idx, len(player_inputs))
+        out += bytes(encode_keys(keys) for _, keys in player_inputs)
+        n += 1
+    log.append(TICK, _U16.pack(n) + out)
+
+
+def record_join(state, player: str) -> None:
+    _record_player(state, JOIN, player)
+
+
+def record_leave(state, player: str) -> None:
+    _record_player(state, LEAVE, player)
+
+
+def _record_player(state, kind: int, player: str) -> None:
+    """<H idx>"""
+    log = _logs.get(state.id)
+    record = state.players.get(player)
+    if log is not None and record is not None:
+        log.append(kind, _U16.pack(record.idx))
+
+
+def record_taggers(state) -> None:
+    """<B team code>"""
+    log = _logs.get(state.id)
+    if log is not None:
+        log.append(TAGGERS, bytes((TEAM_CODES.get(state.attacking_team, 0),)))
+
+
+def record_respawns(state, records) -> None:
+    """<H n> then per player <H idx><B new team code>"""
+    log = _logs.get(state.id)
+    if log is None:
+        return
+    payload = _U16.pack(len(records)) + b''.join(
+        _ENTRY.pack(r.idx, TEAM_CODES.get(r.team, 0)) for r in records)
+    log.append(RESPAWN, payload)
+
+
+def record_round_end(state, round_no: int, winner: str) -> None:
+    """<B round><B winner code><H red><H blue><I digest>"""
+    log = _logs.get(state.id)
+    if log is None:
+        return
+    counts = state.team_counts()
+    log.append(ROUND_END, _ROUND_END.pack(round_no, TEAM_CODES.get(winner, 0),
+                                          counts['red'], counts['blue'], digest(state)))
+
+
+def digest(state) -> int:
+    """CRC32 of every player's position, team and alive flag."""
+    rows = ';'.join(f"{p.id},{p.x!r},{p.y!r},{p.team},{int(p.alive)}"
+                    for p in sorted(state.players.values(), key=lambda p: p.id))
+    return zlib.crc32(rows.encode())
+
+
+# ─── Reading ────────────────────────────────────────────
+def encode_keys(keys: dict) -> int:
+    return sum(bit for name, bit in KEY_BITS if keys.get(name))
+
+
+def decode_keys(bits: int) -> dict:
+    return {name: bool(bits & bit) for name, bit in KEY_BITS}
+
+
+def read(path: str) -> Iterator[Tuple[int, int, object]]:
+    """Yield (kind, ms, payload) with payloads decoded; unknown kinds are skipped."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a match log")
+    pos = len(MAGIC)
+    while pos + _HEADER.size <= len(data):
+        kind, ms, length = _HEADER.unpack_from(data, pos)
+        pos += _HEADER.size
+        payload = data[pos:pos + length]
+        pos += length
+        if len(payload) < length:
+            break       # truncated tail (server stopped mid-write)
+        decoded = _decode(kind, payload)
+        if decoded is not None:
+            yield kind, ms, decoded
+
+
+def _decode(kind: int, payload: bytes):
+    if kind == START:
+        start = json.loads(payload)
+        spec = start.get('map')
+        if spec and 'tiles' in spec:
+            spec['tiles'] = base64.b64decode(spec['tiles'])
+        return start
+    if kind == TICK:
+        (n,), pos, entries = _U16.unpack_from(payload), _U16.size, []
+        for _ in range(n):
+            idx, count = _ENTRY.unpack_from(payload, pos)
+            pos += _ENTRY.size
+            entries.append((idx, list(payload[pos:pos + count])))
+            pos += count
+        return entries
+    if kind in (JOIN, LEAVE):
+        return _U16.unpack(payload)[0]
+    if kind == TAGGERS:
+        return TEAM_NAMES.get(payload[0])
+    if kind == RESPAWN:
+        (n,) = _U16.unpack_from(payload)
+        return [(idx, TEAM_NAMES.get(code))
+                for idx, code in _ENTRY.iter_unpack(payload[_U16.size:_U16.size + n * _ENTRY.size])]
+    if kind == ROUND_END:
+        round_no, winner, red, blue, crc = _ROUND_END.unpack(payload)
+        return round_no, TEAM_NAMES.get(winner, 'draw'), red, blue, crc
+    return None
@@ -0,0 +1,260 @@
+# util/metrics.py
+"""
+In-process metrics, served in Prometheus text format on GET /metrics.
+
+instrument(app, socketio) wraps every handler registered with
+`@socketio.on` afterwards and every Flask request: each gets a latency
+histogram labelled by event ("/battlefield move") or route
+("GET /lobby/<lobby_id>").  MongoListener counts Mongo calls and their
+time per event, every socketio.emit is counted with its fan-out (local
+recipients), and gauges for live rooms, players, scheduler backlog,
+input limiting and the terrain cache are read at scrape time.
+
+Recording is a perf_counter pair, a bisect and a few dict updates, so
+it stays on in production; set METRICS=false to skip instrumenting.
+"""
+
+import inspect
+import os
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Sequence, Tuple
+
+from eventlet.semaphore import Semaphore
+from flask import Blueprint, Response, g, request
+from pymongo import monitoring
+
+from util import input_limiter, room_state, terrain_cache
+from util.db_profile import current_event
+from util.scheduler import scheduler
+
+# ─── Tunables ────────────────────────────────────────────
+METRICS_ENABLED = os.environ.get('METRICS', 'true').lower() == 'true'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+PREFIX = 'mmo_'
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)      # last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# ─── In-memory state:  label → Histogram / [calls, seconds] / count ──
+_handler_latency: Dict[str, Histogram] = {}
+_emit_fanout: Dict[str, Histogram] = {}
+_mongo: Dict[str, list] = {}
+_lock = Semaphore()
+
+
+def observe_handler(event: str, seconds: float) -> None:
+    with _lock:
+        hist = _handler_latency.get(event)
+        if hist is None:
+            hist = _handler_latency[event] = Histogram(LATENCY_BUCKETS)
+        hist.observe(seconds)
+
+
+def observe_emit(event: str, fanout: int) -> None:
+    with _lock:
+        hist = _emit_fanout.get(event)
+        if hist is None:
+            hist = _emit_fanout[event] = Histogram(FANOUT_BUCKETS)
+        hist.observe(fanout)
+
+
+def observe_mongo(event: str, seconds: float) -> None:
+    with _lock:
+        stats = _mongo.get(event)
+        if stats is None:
+            stats = _mongo[event] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+
+
+class MongoListener(monitoring.CommandListener):
+    """Mongo calls and time per socket event / route; sync pymongo reports
+    completion on the green thread that issued the command."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe_mongo(current_event(), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        observe_mongo(current_event(), event.duration_micros / 1e6)
+
+
+# ─── Instrumentation ────────────────────────────────────
+def watch_mongo() -> None:
+    """Count Mongo calls for /metrics; must run before util.database creates its client."""
+    if METRICS_ENABLED:
+        monitoring.register(MongoListener())
+
+
+def instrument(app, socketio) -> None:
+    """Time handlers registered from now on, every request and every emit."""
+    if not METRICS_ENABLED:
+        return
+    _instrument_handlers(socketio)
+    _instrument_emit(socketio)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.teardown_request
+    def _stop_timer(exc=None):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        # the rule, not the path, so /lobby/<lobby_id> is one series
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_handler(f"{request.method} {rule}", time.perf_counter() - start)
+
+    app.register_blueprint(metrics_bp)
+
+
+def _instrument_handlers(socketio) -> None:
+    register = socketio.on
+
+    def timed_on(message, namespace=None):
+        label = f"{namespace or '/'} {message}"
+        decorator = register(message, namespace)
+
+        def wrap(handler):
+            # keep zero-argument handlers zero-argument: Flask-SocketIO
+            # retries connect handlers without `auth` on TypeError
+            if inspect.signature(handler).parameters:
+                @wraps(handler)
+                def timed(*args):
+                    start = time.perf_counter()
+                    try:
+                        return handler(*args)
+                    finally:
+                        observe_handler(label, time.perf_counter() - start)
+            else:
+                @wraps(handler)
+                def timed():
+                    start = time.perf_counter()
+                    try:
+                        return handler()
+                    finally:
+                        observe_handler(label, time.perf_counter() - start)
+            decorator(timed)
+            return handler
+        return wrap
+
+    socketio.on = timed_on
+
+
+def _instrument_emit(socketio) -> None:
+    emit = socketio.emit
+
+    def counted_emit(event, *args, **kwargs):
+        namespace = kwargs.get('namespace') or '/'
+        to = kwargs.get('to') or kwargs.get('room')
+        observe_emit(event, _fanout(socketio, namespace, to))
+        return emit(event, *args, **kwargs)
+
+    socketio.emit = counted_emit
+
+
+def _fanout(socketio, namespace: str, to) -> int:
+    """Recipients connected to this process (None: the whole namespace)."""
+    server = socketio.server
+    if server is None:
+        return 0
+    rooms = server.manager.rooms.get(namespace, {})
+    if isinstance(to, (list, tuple)):
+        return sum(len(rooms.get(r, ())) for r in to)
+    return len(rooms.get(to, ()))
+
+
+# ─── Exposition ─────────────────────────────────────────
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name: str, help_text: str, label: str,
+                     series: List[Tuple[str, Histogram]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, hist in series:
+        lbl = f'{label}="{_label(key)}"'
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{lbl},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{lbl},le="+Inf"}} {hist.count}')
+        lines.append(f'{name}_sum{{{lbl}}} {hist.sum}')
+        lines.append(f'{name}_count{{{lbl}}} {hist.count}')
+    return lines
+
+
+def _gauge_lines(name: str, help_text: str, kind: str, samples) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+    return lines
+
+
+def render() -> str:
+    with _lock:
+        handlers = sorted((k, _copy(h)) for k, h in _handler_latency.items())
+        fanout = sorted((k, _copy(h)) for k, h in _emit_fanout.items())
+        mongo = sorted((k, tuple(v)) for k, v in _mongo.items())
+
+    rooms = list(room_state.rooms.values())
+    lines = []
+    lines += _histogram_lines(PREFIX + 'handler_seconds',
+                              'Socket event and HTTP route handler latency.', 'event', handlers)
+    lines += _gauge_lines(PREFIX + 'mongo_calls_total', 'Mongo commands issued per event.',
+                          'counter', [(f'event="{_label(k)}"', calls) for k, (calls, _) in mongo])
+    lines += _gauge_lines(PREFIX + 'mongo_seconds_total', 'Time spent in Mongo per event.',
+                          'counter', [(f'event="{_label(k)}"', secs) for k, (_, secs) in mongo])
+    lines += _histogram_lines(PREFIX + 'emit_fanout',
+                              'Local recipients per emit; _count is the number of emits.',
+                              'event', fanout)
+    lines += _gauge_lines(PREFIX + 'active_rooms', 'Matches held in memory.', 'gauge',
+                          [('', len(rooms))])
+    lines += _gauge_lines(PREFIX + 'active_players', 'Players in in-memory matches.', 'gauge',
+                          [('', sum(len(s.players) for s in rooms))])
+    lines += _gauge_lines(PREFIX + 'scheduler_backlog', 'Pending scheduled game events.',
+                          'gauge', [('', scheduler.backlog())])
+    lines += _gauge_lines(PREFIX + 'inputs_total', 'Battlefield inputs by limiter outcome.',
+                          'counter', [(f'result="{k}"', v)
+                                      for k, v in input_limiter.counters.items()])
+    lines += _gauge_lines(PREFIX + 'terrain_cache_total', 'Compiled terrain cache lookups.',
+                          'counter', [(f'result="{k}"', v)
+                                      for k, v in terrain_cache.counters.items()])
+    return '\n'.join(lines) + '\n'
+
+
+def _copy(hist: Histogram) -> Histogram:
+    snapshot = Histogram(hist.buckets)
+    snapshot.counts = list(hist.counts)
+    snapshot.sum = hist.sum
+    snapshot.count = hist.count
+    return snapshot
+
+
+# Blueprint
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,123 @@
+# util/protocol.py
+"""
+Compact binary wire format for battlefield position broadcasts.
+
+Clients opt in by joining with {"format": "bin"}.  They get the strings
+once in a JSON `player_roster` ([{"i": idx, "id": name, "avatar": fn}])
+and from then on positions as packed little-endian frames keyed by the
+player's integer index:
+
+    header    uint8 kind, uint16 count
+    keyframe  count × (uint16 idx, uint32 x*100, uint32 y*100, uint8 flags)
+    delta     count × (uint16 idx, uint32 x*100, uint32 y*100, uint32 seq)
+
+flags: bits 0-1 team (0 none, 1 red, 2 blue), bit 2 dead.  Keyframes
+carry every player, deltas only those whose input was applied this
+tick; seq is the last input sequence number the server applied for that
+player, which the player's own client uses to reconcile its prediction.
+JSON clients keep receiving player_positions / players_moved.
+"""
+
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from eventlet.semaphore import Semaphore
+
+KEYFRAME = 1
+DELTA = 2
+
+FORMAT_JSON = 'json'
+FORMAT_BIN = 'bin'
+
+TEAM_CODES = {'red': 1, 'blue': 2}
+FLAG_DEAD = 4
+
+_HEADER = struct.Struct('<BH')
+_KEY_ENTRY = struct.Struct('<HIIB')
+_DELTA_ENTRY = struct.Struct('<HIII')
+
+
+def _fixed(v: float) -> int:
+    return int(round(v * 100))
+
+
+def encode_keyframe(players: Iterable) -> bytes:
+    """Pack every PlayerRecord in <players> with its team and alive flag."""
+    players = list(players)
+    buf = bytearray(_HEADER.size + _KEY_ENTRY.size * len(players))
+    _HEADER.pack_into(buf, 0, KEYFRAME, len(players))
+    off = _HEADER.size
+    for p in players:
+        flags = TEAM_CODES.get(p.team, 0) | (0 if p.alive else FLAG_DEAD)
+        _KEY_ENTRY.pack_into(buf, off, p.idx, _fixed(p.x), _fixed(p.y), flags)
+        off += _KEY_ENTRY.size
+    return bytes(buf)
+
+
+def encode_delta(players: Iterable) -> bytes:
+    """Pack the positions and acknowledged input seqs of <players>."""
+    players = list(players)
+    buf = bytearray(_HEADER.size + _DELTA_ENTRY.size * len(players))
+    _HEADER.pack_into(buf, 0, DELTA, len(players))
+    off = _HEADER.size
+    for p in players:
+        _DELTA_ENTRY.pack_into(buf, off, p.idx, _fixed(p.x), _fixed(p.y), p.last_seq)
+        off += _DELTA_ENTRY.size
+    return bytes(buf)
+
+
+def encode_roster(players_out: Iterable[dict], state) -> list:
+    """JSON roster mapping each player's index to its name and avatar."""
+    return [{'i': state.players[p['id']].idx, 'id': p['id'], 'avatar': p.get('avatar')}
+            for p in players_out if p['id'] in state.players]
+
+
+# ─── Per-connection format subscriptions ────────────────
+_subscriptions: Dict[str, tuple] = {}          # sid → (room_id, fmt)
+_counts: Dict[tuple, int] = {}                 # (room_id, fmt) → connections
+_viewers: Dict[str, Dict[str, tuple]] = {}     # room_id → { sid: (fmt, player) }
+_lock = Semaphore()
+
+
+def format_room(room_id: str, fmt: str) -> str:
+    """Socket.IO room holding the <fmt> clients of <room_id>."""
+    return f"{room_id}:{fmt}"
+
+
+def subscribe(sid: str, room_id: str, fmt: str, player: Optional[str] = None) -> None:
+    unsubscribe(sid)
+    with _lock:
+        _subscriptions[sid] = (room_id, fmt)
+        _counts[(room_id, fmt)] = _counts.get((room_id, fmt), 0) + 1
+        _viewers.setdefault(room_id, {})[sid] = (fmt, player)
+
+
+def unsubscribe(sid: str) -> None:
+    with _lock:
+        key = _subscriptions.pop(sid, None)
+        if key is None:
+            return
+        room_viewers = _viewers.get(key[0], {})
+        room_viewers.pop(sid, None)
+        if not room_viewers:
+            _viewers.pop(key[0], None)
+        left = _counts.get(key, 0) - 1
+        if left > 0:
+            _counts[key] = left
+        else:
+            _counts.pop(key, None)
+
+
+def format_of(sid: str) -> str:
+    sub = _subscriptions.get(sid)
+    return sub[1] if sub else FORMAT_JSON
+
+
+def has_subscribers(room_id: str, fmt: str) -> bool:
+    return _counts.get((room_id, fmt), 0) > 0
+
+
+def viewers(room_id: str) -> List[Tuple[str, str, Optional[str]]]:
+    """[(sid, fmt, player)] for every connection watching <room_id>."""
+    with _lock:
+        return [(sid, fmt, player) for sid, (fmt, player) in _viewers.get(room_id, {}).items()]
@@ -0,0 +1,78 @@
+# util/respawns.py
+"""
+Batched respawns for tagged players.
+
+A tag only appends (deadline, player) to its room's deadline queue.  One
+scheduler event per room fires at the earliest deadline and also drains
+everyone due within the next RESPAWN_BATCH_SEC (they come back that much
+early, never late).  Each switches to its tagger's team and comes back
+alive, the room is flushed to Mongo in a single bulk_write and clients
+get one compact `players_respawned` ([{"id", "team"}]) instead of a full
+roster resend per victim.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from eventlet.semaphore import Semaphore
+
+from util import match_log, room_state, simulation
+from util.scheduler import scheduler
+
+# ─── Tunables ────────────────────────────────────────────
+RESPAWN_SEC = 5              # seconds dead after being tagged
+RESPAWN_BATCH_SEC = float(os.environ.get('RESPAWN_BATCH', 0.5))   # window drained together
+
+# ─── In-memory state:  room_id → deque[(deadline, player)] ──
+# deadlines are tag time + RESPAWN_SEC, so each queue is already sorted
+_queues: Dict[str, Deque[Tuple[float, str]]] = {}
+_scheduled = set()           # rooms with a batch event on the scheduler
+_lock = Semaphore()
+
+
+def queue_respawn(sock, room_collection, room_id: str, player: str) -> None:
+    """<player> was tagged just now; bring them back RESPAWN_SEC from now."""
+    deadline = time.monotonic() + RESPAWN_SEC
+    with _lock:
+        _queues.setdefault(room_id, deque()).append((deadline, player))
+        if room_id in _scheduled:
+            return
+        _scheduled.add(room_id)
+    scheduler.schedule(RESPAWN_SEC, _process, sock, room_collection, room_id, group=room_id)
+
+
+def drop_room(room_id: str) -> None:
+    with _lock:
+        _queues.pop(room_id, None)
+        _scheduled.discard(room_id)
+
+
+def _process(sock, room_collection, room_id: str) -> None:
+    now = time.monotonic()
+    due = []
+    with _lock:
+        queue = _queues.get(room_id)
+        while queue and queue[0][0] <= now + RESPAWN_BATCH_SEC:
+            due.append(queue.popleft()[1])
+        next_deadline = queue[0][0] if queue else None
+        if next_deadline is None:
+            _queues.pop(room_id, None)
+            _scheduled.discard(room_id)
+
+    state = room_state.rooms.get(room_id)
+    if state is None:
+        drop_room(room_id)
+        return
+
+    respawned = [r for r in (simulation.respawn(state, player) for player in due) if r]
+    if respawned:
+        match_log.record_respawns(state, respawned)
+        room_state.flush_room(room_collection, room_id)
+        sock.emit('players_respawned', [{'id': r.id, 'team': r.team} for r in respawned],
+                  room=room_id, namespace='/battlefield')
+
+    if next_deadline is not None:
+        scheduler.schedule(max(next_deadline - now, 0), _process, sock, room_collection,
+                           room_id, group=room_id)
@@ -0,0 +1,225 @@
+# util/room_state.py
+"""
+In-process authoritative state for rooms with a match in progress.
+
+While a match runs, positions, teams, alive/dead status and the
+attacking team live here instead of being read from and written to
+MongoDB on every tick.  Changes are marked dirty and written back in one
+bulk_write per room by a periodic flusher, plus a final flush when the
+match ends.
+"""
+
+import os
+import logging
+from typing import Dict, Optional
+
+from eventlet import sleep
+from eventlet.semaphore import Semaphore
+from pymongo import UpdateOne
+
+from util import match_log, terrain_cache
+from util.spatial import SpatialHash
+
+# ─── Tunables ────────────────────────────────────────────
+FLUSH_INTERVAL_SEC = float(os.environ.get('ROOM_FLUSH_INTERVAL', 2.0))
+
+
+class PlayerRecord:
+    __slots__ = ('id', 'idx', 'x', 'y', 'team', 'is_tagger', 'alive', 'tagger', 'dirty',
+                 'last_seq')
+
+    def __init__(self, pid, idx, x, y, team, is_tagger=False):
+        self.id = pid
+        self.idx = idx          # small integer id used on the binary wire
+        self.x = x
+        self.y = y
+        self.team = team
+        self.is_tagger = is_tagger
+        self.alive = True
+        self.tagger = None      # who tagged us while dead
+        self.dirty = False      # needs writing back to Mongo
+        self.last_seq = 0       # last client input sequence number applied
+
+    def to_dict(self) -> dict:
+        return {'id': self.id, 'x': self.x, 'y': self.y,
+                'team': self.team, 'is_tagger': self.is_tagger}
+
+
+class RoomState:
+    __slots__ = ('id', 'players', 'terrain', 'attacking_team',
+                 'red_team', 'blue_team', 'dirty', 'grid', 'collision')
+
+    def __init__(self, doc: dict):
+        self.id = doc['id']
+        self.players: Dict[str, PlayerRecord] = {}
+        for p in doc.get('players', []):
+            if p.get('id'):
+                self.players[p['id']] = PlayerRecord(p['id'], len(self.players), p['x'], p['y'],
+                                                     p.get('team'), p.get('is_tagger', False))
+        # map and per-team blocked-cell masks, shared through the terrain cache
+        self.terrain, self.collision = terrain_cache.for_room(doc)
+        self.attacking_team = doc.get('attacking_team')
+        # lobby rosters, only used to pick default avatars
+        self.red_team = frozenset(doc.get('red_team', []))
+        self.blue_team = frozenset(doc.get('blue_team', []))
+        self.dirty = False      # room-level fields need writing back
+        # tile-cell index of player positions, for tag proximity checks
+        self.grid = SpatialHash(1.0)
+        for p in self.players.values():
+            self.grid.insert(p.id, p.x, p.y)
+
+    def move_player(self, record: PlayerRecord, x: float, y: float) -> None:
+        record.x, record.y = x, y
+        record.dirty = True
+        self.grid.move(record.id, x, y)
+
+    def remove_player(self, player: str) -> None:
+        self.players.pop(player, None)
+        self.grid.remove(player)
+
+    def set_attacking_team(self, taggers: str) -> None:
+        """Flag <taggers> as the attacking team and mark each player's is_tagger."""
+        self.attacking_team = taggers
+        self.dirty = True
+        for p in self.players.values():
+            p.is_tagger = (p.team == taggers)
+            p.dirty = True
+
+    def nearby(self, record: PlayerRecord, radius: float = 1.0):
+        """Other players within <radius> tiles (Chebyshev) of <record>."""
+        players = self.players
+        for pid in self.grid.neighbours(record.x, record.y):
+            other = players.get(pid)
+            if other is None or other is record:
+                continue
+            if abs(other.x - record.x) <= radius and abs(other.y - record.y) <= radius:
+                yield other
+
+    def to_doc(self) -> dict:
+        """Room-document shaped view, for helpers such as enrich_with_avatars."""
+        return {'id': self.id,
+                'red_team': self.red_team,
+                'blue_team': self.blue_team,
+                'attacking_team': self.attacking_team,
+                'players': [p.to_dict() for p in self.players.values()]}
+
+    def team_counts(self) -> Dict[str, int]:
+        counts = {'red': 0, 'blue': 0}
+        for p in self.players.values():
+            if p.team in counts:
+                counts[p.team] += 1
+        return counts
+
+
+# ─── In-memory store:  room_id → RoomState ──────────────
+rooms: Dict[str, RoomState] = {}
+player_rooms: Dict[str, str] = {}      # player_name → room_id
+_lock = Semaphore()
+_flusher_started = False
+
+
+def load_room(room_collection, room_id: str) -> Optional[RoomState]:
+    """(Re)load <room_id> from Mongo, replacing any cached state."""
+    doc = room_collection.find_one({'id': room_id})
+    if not doc:
+        return None
+    state = RoomState(doc)
+    if 'terrain' in doc and 'map' not in doc and state.terrain:
+        # rooms stored with the full grid: keep the packed map from now on
+        room_collection.update_one({'id': room_id},
+                                   {'$set': {'map': state.terrain.spec()},
+                                    '$unset': {'terrain': ''}})
+    with _lock:
+        rooms[room_id] = state
+        for pid in state.players:
+            player_rooms[pid] = room_id
+    return state
+
+
+def get_room(room_collection, room_id: str) -> Optional[RoomState]:
+    """Cached state for <room_id>, loading it from Mongo on first use."""
+    state = rooms.get(room_id)
+    if state is not None:
+        return state
+    return load_room(room_collection, room_id)
+
+
+def room_of(player: str) -> Optional[RoomState]:
+    room_id = player_rooms.get(player)
+    return rooms.get(room_id) if room_id else None
+
+
+def remove_player(room_id: str, player: str) -> None:
+    with _lock:
+        state = rooms.get(room_id)
+        if state:
+            state.remove_player(player)
+        if player_rooms.get(player) == room_id:
+            player_rooms.pop(player, None)
+
+
+def set_attacking_team(room_id: str, taggers: str) -> None:
+    """Flag <taggers> as the attacking team and mark each player's is_tagger."""
+    state = rooms.get(room_id)
+    if not state:
+        return
+    with _lock:
+        state.set_attacking_team(taggers)
+    match_log.record_taggers(state)
+
+
+def flush_room(room_collection, room_id: str) -> None:
+    """Write every dirty field of <room_id> back to Mongo in one bulk_write."""
+    state = rooms.get(room_id)
+    if not state:
+        return
+
+    ops = []
+    with _lock:
+        if state.dirty:
+            ops.append(UpdateOne({'id': room_id},
+                                 {'$set': {'attacking_team': state.attacking_team}}))
+            state.dirty = False
+        for p in state.players.values():
+            if not p.dirty:
+                continue
+            ops.append(UpdateOne(
+                {'id': room_id, 'players.id': p.id},
+                {'$set': {'players.$.x': p.x, 'players.$.y': p.y,
+                          'players.$.team': p.team, 'players.$.is_tagger': p.is_tagger}}
+            ))
+            p.dirty = False
+
+    if ops:
+        room_collection.bulk_write(ops, ordered=False)
+
+
+def drop_room(room_collection, room_id: str, flush: bool = True) -> None:
+    """Forget <room_id>, optionally flushing it first (match end)."""
+    if flush:
+        flush_room(room_collection, room_id)
+    with _lock:
+        state = rooms.pop(room_id, None)
+        if state:
+            for pid in state.players:
+                if player_rooms.get(pid) == room_id:
+                    player_rooms.pop(pid, None)
+
+
+def start_flusher(sock, room_collection) -> None:
+    """Start the periodic write-behind loop (once per process)."""
+    global _flusher_started
+    if _flusher_started:
+        return
+    _flusher_started = True
+    sock.start_background_task(_flush_loop, room_collection)
+
+
+def _flush_loop(room_collection) -> None:
+    while True:
+        sleep(FLUSH_INTERVAL_SEC)
+        for room_id in list(rooms):
+            try:
+                flush_room(room_collection, room_id)
+            except Exception:
+                logging.exception(f"Write-behind flush failed for room {room_id}")
@@ -1,26 +1,28 @@
 import uuid
-import html
 
 from flask_socketio import emit, join_room
 from flask import request
-from util.auth import hash_token
+from util.auth import bind_socket_user, socket_user, unbind_socket_user
 from bson import ObjectId
 from util.rounds import kick_off_round_system
+from util import cluster, lobby_index, room_state, roster, terrain, user_cache
+from util.terrain import MAP_HEIGHT, MAP_WIDTH, Terrain
 
 
 connected_users = {}
 
-def choose_avatar(username, room_doc, user_doc):
+def choose_avatar(username, teams, user_doc):
     """
     Return an avatar filename (no leading /static/ part).
     • If the user uploaded one (user_doc["avatar"]), use it.
-    • Otherwise return team default PNG.
+    • Otherwise return team default PNG (<teams> is a roster.Roster).
     """
     if user_doc.get("avatar"):
         return user_doc["avatar"]
-    if username in room_doc["red_team"]:
+    team = teams.team_of(username)
+    if team == "red":
         return "defaultRedTeamPNG.png"
-    if username in room_doc["blue_team"]:
+    if team == "blue":
         return "defaultBlueTeamPNG.png"
 
 def enrich_with_avatars(room_doc, user_coll):
@@ -28,53 +30,29 @@ def enrich_with_avatars(room_doc, user_coll):
     Return a fresh list of player dicts, each with an .avatar key that is
     **just the filename** (no /static/ prefix).  Front-end prepends that.
     """
+    players  = room_doc.get("players", [])
+    profiles = user_cache.get_users(user_coll, [p["id"] for p in players])
+    teams    = roster.Roster(room_doc)
     players_out = []
-    for p in room_doc.get("players", []):
+    for p in players:
         uid       = p["id"]
-        user_doc  = user_coll.find_one({"username": uid}) or {}
-        avatar_fn = choose_avatar(uid, room_doc, user_doc)
+        avatar_fn = choose_avatar(uid, teams, profiles[uid])
         players_out.append({**p, "avatar": avatar_fn})
     return players_out
 
 
 def register_room_handlers(socketio, user_collection, room_collection):
 
-    def _emit_team_counts(room_id: str):
-        """
-        Broadcast {"red": <int>, "blue": <int>} to everyone in <room_id>.
-        """
-        room = room_collection.find_one(
-            {"id": room_id},
-            {"red_team": 1, "blue_team": 1, "_id": 0}
-        )
-        if not room:
-            return
-
-        socketio.emit(
-            'team_counts',
-            {
-                "red": len(room.get("red_team", [])),
-                "blue": len(room.get("blue_team", [])),
-            },
-            room=room_id,
-            namespace='/lobby'
-        )
-
     @socketio.on('create_room', namespace='/lobby')
     def handle_create_room(room_name):
-        auth_token = request.cookies.get('auth_token')
-        if not auth_token:
-            return
-
-        user = user_collection.find_one({'auth_token': hash_token(auth_token)})
-        if not user:
+        username = socket_user(request.sid)
+        if not username:
             return
-
-        username = user['username']
         room_id = str(uuid.uuid4())
 
-        # 🔥 Generate randomized terrain
-        generated_terrain = generate_battlefield_terrain()
+        # 🔥 Randomized terrain: only the generator seed and size are stored,
+        # chunks are rebuilt from them on demand
+        generated_terrain = Terrain.generate()
 
         new_room = {
             "id": room_id,
@@ -85,24 +63,23 @@ def register_room_handlers(socketio, user_collection, room_collection):
             "no_team": [],
             "players": [],
             "game_started": False,
-            "terrain": generated_terrain  # 🔥 store it in MongoDB
+            "map": generated_terrain.spec()  # 🔥 store it in MongoDB
         }
         room_collection.insert_one(new_room)
 
-        all_rooms = [
-            {"id": str(room["id"]), "name": html.escape(room["room_name"])}
-            for room in room_collection.find({"game_started": False})
-        ]
-        emit('room_list', all_rooms, broadcast=True)
+        entry = lobby_index.add_room(room_collection, room_id, room_name)
+        emit('room_added', entry, broadcast=True)
 
 
     @socketio.on('get_rooms', namespace='/lobby')
-    def handle_get_rooms():
-        all_rooms = [
-            {"id": str(room["id"]), "name": html.escape(room["room_name"])}
-            for room in room_collection.find({"game_started": False})
-        ]
-        emit('room_list', all_rooms)
+    def handle_get_rooms(data=None):
+        data = data or {}
+        try:
+            offset = int(data.get('offset', 0))
+            limit = int(data.get('limit', lobby_index.ROOM_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return
+        emit('room_list', lobby_index.snapshot(room_collection, offset, limit))
 
     @socketio.on('join_room', namespace='/lobby')
     def handle_join_room(data):
@@ -119,13 +96,10 @@ def register_room_handlers(socketio, user_collection, room_collection):
             return
 
         if page == 'team_select' and room_id:
-            auth_token = request.cookies.get('auth_token')
-            user = user_collection.find_one({'auth_token': hash_token(auth_token)})
-            if not user:
+            username = socket_user(request.sid)
+            if not username:
                 return
 
-            username = user['username']
-
             # 🔥 Disconnect cleanup for the same user (see next section)
             for sid, name in list(connected_users.items()):
                 if name == username:
@@ -134,84 +108,36 @@ def register_room_handlers(socketio, user_collection, room_collection):
             connected_users[request.sid] = username
             join_room(room_id)  # <-- 🔥 this is the missing key!
 
-            room = room_collection.find_one({"id": room_id})
-            if not room:
-                return
-
-            if username not in room["red_team"] + room["blue_team"] + room["no_team"]:
-                room_collection.update_one(
-                    {"id": room_id},
-                    {"$push": {"no_team": username}}
-                )
-
-            updated = room_collection.find_one({"id": room_id})
-            emit('team_red_list', updated["red_team"], room=room_id)
-            emit('team_blue_list', updated["blue_team"], room=room_id)
-            emit('no_team_list', updated["no_team"], room=room_id)
-            _emit_team_counts(room_id)
+            teams = roster.ensure_member(room_collection, room_id, username)
+            if teams:
+                roster.emit_roster(socketio, teams)
 
     @socketio.on('join_team', namespace='/lobby')
     def handle_join_team(data):
         team = data.get('team')
         room_id = data.get('room_id')
 
-        auth_token = request.cookies.get('auth_token')
-        if not auth_token:
-            return
-
-        user = user_collection.find_one({'auth_token': hash_token(auth_token)})
-        if not user:
+        username = socket_user(request.sid)
+        if not username:
             return
-
-        username = user['username']
-        room = room_collection.find_one({"id": room_id})
-        if not room:
+        # one atomic switch: off the other teams, onto this one
+        teams = roster.set_team(room_collection, room_id, username, team)
+        if not teams:
             return
 
-
-        # Remove from all teams
-        room_collection.update_one(
-            {"id": room_id},
-            {"$pull": {
-                "red_team": username,
-                "blue_team": username,
-                "no_team": username
-            }}
-        )
-
-        # Add to selected team
-        if team == "red":
-            room_collection.update_one({"id": room_id}, {"$push": {"red_team": username}})
-        elif team == "blue":
-            room_collection.update_one({"id": room_id}, {"$push": {"blue_team": username}})
-        else:
-            room_collection.update_one({"id": room_id}, {"$push": {"no_team": username}})
-
         # Ensure socket joins the room
         join_room(room_id)
 
-        # Emit updated teams
-        updated = room_collection.find_one({"id": room_id})
-        emit('team_red_list', updated["red_team"], room=room_id)
-        emit('team_blue_list', updated["blue_team"], room=room_id)
-        emit('no_team_list', updated["no_team"], room=room_id)
+        roster.emit_roster(socketio, teams)
         emit('joined_team', {'room_id': room_id, 'team': team}, to=request.sid)
-        _emit_team_counts(room_id)
     @socketio.on('am_i_owner', namespace='/lobby')
     def handle_am_i_owner(data):
         room_id = data.get('room_id')
-        auth_token = request.cookies.get('auth_token')
-
-        if not auth_token:
-            emit('owner_status', {'is_owner': False})
-            return
-
-        user = user_collection.find_one({'auth_token': hash_token(auth_token)})
-        if not user:
+        username = socket_user(request.sid)
+        if not username:
             emit('owner_status', {'is_owner': False})
             return
 
-        username = user['username']
         room = room_collection.find_one({'id': room_id})
 
         if not room:
@@ -225,18 +151,14 @@ def register_room_handlers(socketio, user_collection, room_collection):
 
     @socketio.on('start_game', namespace='/lobby')
     def handle_start_game(data):
-        room_id = data.get('room_id')
-
-        auth_token = request.cookies.get('auth_token')
-        if not auth_token:
+        if not isinstance(data, dict):
             return
+        room_id = data.get('room_id')
 
-        user = user_collection.find_one({'auth_token': hash_token(auth_token)})
-        if not user:
+        username = socket_user(request.sid)
+        if not username:
             return
 
-        username = user['username']
-
         room = room_collection.find_one({'id': room_id})
         if not room:
             return
@@ -244,23 +166,32 @@ def register_room_handlers(socketio, user_collection, room_collection):
         if username != room.get('owner'):
             return  # ❌ Only owner can start
 
+        if not cluster.owns_room(room_id):
+            return  # the match must run on the room's own worker
+
+        # start once: a repeated start_game would reload the live match
+        # state and run a second round schedule
+        if room.get('game_started') or room_id in room_state.rooms:
+            return
+        claimed = room_collection.update_one({'id': room_id, 'game_started': {'$ne': True}},
+                                             {'$set': {'game_started': True}})
+        if not claimed.modified_count:
+            return
 
         # ✅ Loop through all players on red and blue teams
-        players_to_start = room.get('red_team', []) + room.get('blue_team', [])
+        teams = roster.Roster(room)
+        field = terrain.from_doc(room) or Terrain(MAP_WIDTH, MAP_HEIGHT, None)
+        already_placed = {p['id'] for p in room.get('players', [])}
 
         battlefield_players = []
 
-        for player in players_to_start:
+        for player in teams.playing():
             # Determine spawn position
-            if player in room.get('red_team', []):
-                spawn_x, spawn_y = 1, 1
-                team = "red"
-            else:
-                spawn_x, spawn_y = 29, 24
-                team = "blue"
+            team = "red" if player in teams.red else "blue"
+            spawn_x, spawn_y = field.spawn_point(team)
 
             # Check if player already exists in players list (shouldn't, but safe check)
-            if any(p['id'] == player for p in room.get('players', [])):
+            if player in already_placed:
                 continue
 
             # Prepare player data
@@ -284,27 +215,22 @@ def register_room_handlers(socketio, user_collection, room_collection):
         # Emit updated players
         updated_room = room_collection.find_one({'id': room_id})
 
-        players_out = []
-        for p in updated_room.get('players', []):
-            uid = p['id']
-            avatar_fn = choose_avatar(
-                uid,
-                updated_room,
-                user_collection.find_one({'username': uid}) or {}
-            )
-            players_out.append({
-                "id": uid,
+        # the match is live from here on: battlefield reads the in-memory state
+        room_state.load_room(room_collection, room_id)
+
+        players_out = [
+            {
+                "id": p["id"],
                 "x": p["x"],
                 "y": p["y"],
                 "team": p.get("team"),
-                "avatar": avatar_fn
-            })
-
-        all_rooms = [
-            {"id": str(room["id"]), "name": html.escape(room["room_name"])}
-            for room in room_collection.find({"game_started": False})
+                "avatar": p["avatar"]
+            }
+            for p in enrich_with_avatars(updated_room, user_collection)
         ]
-        socketio.emit('room_list', all_rooms, namespace='/lobby')
+
+        lobby_index.remove_room(room_id)
+        socketio.emit('room_removed', {"id": room_id}, namespace='/lobby')
 
         emit('player_positions', players_out, room=room_id)
 
@@ -316,87 +242,26 @@ def register_room_handlers(socketio, user_collection, room_collection):
     @socketio.on('disconnect', namespace='/lobby')
     def handle_disconnect():
         sid = request.sid
+        unbind_socket_user(sid)
         username = connected_users.pop(sid, None)
 
         if not username:
             return
 
 
-        # ✅ 1. First, find rooms BEFORE you modify the DB
-        rooms = list(room_collection.find({
-            "$or": [
-                {"red_team": username},
-                {"blue_team": username},
-                {"no_team": username},
-            ]
-        }))
-
-        # ✅ 2. Then remove the user
-        room_collection.update_many(
-            {"id": {"$in": [r["id"] for r in rooms]}},
-            {"$pull": {
-                "red_team": username,
-                "blue_team": username,
-                "no_team": username,
-            }}
-        )
-
-        # ✅ 3. Emit to all rooms the user was in
-        for room in rooms:
-            room_id = room["id"]
-            updated = room_collection.find_one({"id": room_id})
-            socketio.emit('team_red_list', updated["red_team"], room=room_id)
-            socketio.emit('team_blue_list', updated["blue_team"], room=room_id)
-            socketio.emit('no_team_list', updated["no_team"], room=room_id)
-            _emit_team_counts(room_id)
+        # pull the user from every roster they were on, one update per room
+        for teams in roster.remove_everywhere(room_collection, username):
+            roster.emit_roster(socketio, teams)
 
 
     @socketio.on('connect', namespace='/lobby')
     def handle_connect():
         page = request.args.get('page')
         room_id = request.args.get('room_id')
+        bind_socket_user(request.sid)
 
 
 # server-side battlefield terrain generation (Python)
-import random
-
-def generate_battlefield_terrain(width=30, height=20):
-    terrain = [[0 for _ in range(width)] for _ in range(height)]
-
-    # Define safe zones (smaller for 50x50)
-    safe_zone_red = (0, 0, 2, 2)
-    safe_zone_blue = (width-2, height-2, width, height)
-
-    def in_safe_zone(x, y):
-        return (safe_zone_red[0] <= x < safe_zone_red[2] and safe_zone_red[1] <= y < safe_zone_red[3]) or \
-               (safe_zone_blue[0] <= x < safe_zone_blue[2] and safe_zone_blue[1] <= y < safe_zone_blue[3])
-
-    # Step 1: Create medium-sized wall blocks
-    for _ in range(5):  # fewer blocks for small map
-        block_width = random.randint(1, 2)
-        block_height = random.randint(1, 2)
-        start_x = random.randint(0, width - block_width - 1)
-        start_y = random.randint(0, height - block_height - 1)
-
-        for x in range(start_x, start_x + block_width):
-            for y in range(start_y, start_y + block_height):
-                if not in_safe_zone(x, y):
-                    terrain[y][x] = 1  # Wall
-
-    # Step 2: Sprinkle small obstacles
-    for _ in range(20):  # Scaled down for smaller map
-        x = random.randint(0, width - 1)
-        y = random.randint(0, height - 1)
-        if not in_safe_zone(x, y) and terrain[y][x] == 0:
-            terrain[y][x] = 1
-
-    # Step 3: Mark safe zones with team numbers
-    for x in range(width):
-        for y in range(height):
-            if 0 <= x < 2 and 0 <= y < 2:
-                terrain[y][x] = 3  # Red team safe
-            elif width - 2 <= x < width and height - 2 <= y < height:
-                terrain[y][x] = 2  # Blue team safe
-
-    return terrain
-
+def generate_battlefield_terrain(width=MAP_WIDTH, height=MAP_HEIGHT, seed=None):
+    """A whole map as a list of rows; rooms themselves only store Terrain.spec()."""
+    return Terrain.generate(width, height, seed).to_rows()
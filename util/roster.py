@@ -0,0 +1,106 @@
+# util/roster.py
+"""
+Lobby team rosters (red_team / blue_team / no_team on the room document).
+
+Every roster change is a single find_one_and_update that returns the
+updated teams, so a switch costs one Mongo round trip instead of a read,
+two writes and two re-reads.  The returned document is wrapped in a
+Roster, whose frozensets answer "which team is X on" in O(1), and is
+broadcast as one `roster_update` event.
+"""
+
+from typing import Iterable, Optional
+
+from pymongo import ReturnDocument
+
+TEAM_FIELDS = {"red": "red_team", "blue": "blue_team", None: "no_team"}
+_PROJECTION = {"_id": 0, "id": 1, "owner": 1, "red_team": 1, "blue_team": 1, "no_team": 1}
+
+
+class Roster:
+    __slots__ = ('room_id', 'owner', 'red_list', 'blue_list', 'none_list',
+                 'red', 'blue', 'none')
+
+    def __init__(self, doc: dict):
+        self.room_id = doc.get('id')
+        self.owner = doc.get('owner')
+        # join order is kept for display; the sets are for lookups
+        self.red_list = list(doc.get('red_team', []))
+        self.blue_list = list(doc.get('blue_team', []))
+        self.none_list = list(doc.get('no_team', []))
+        self.red = frozenset(self.red_list)
+        self.blue = frozenset(self.blue_list)
+        self.none = frozenset(self.none_list)
+
+    def team_of(self, username: str) -> Optional[str]:
+        if username in self.red:
+            return "red"
+        if username in self.blue:
+            return "blue"
+        return None
+
+    def __contains__(self, username: str) -> bool:
+        return username in self.red or username in self.blue or username in self.none
+
+    def playing(self) -> Iterable[str]:
+        """Red then blue members, in join order."""
+        return self.red_list + self.blue_list
+
+    def to_event(self) -> dict:
+        return {"red": self.red_list,
+                "blue": self.blue_list,
+                "none": self.none_list,
+                "counts": {"red": len(self.red_list), "blue": len(self.blue_list)}}
+
+
+def _not_member(username: str) -> dict:
+    return {field: {"$ne": username} for field in TEAM_FIELDS.values()}
+
+
+def load(room_coll, room_id: str) -> Optional[Roster]:
+    doc = room_coll.find_one({"id": room_id}, _PROJECTION)
+    return Roster(doc) if doc else None
+
+
+def ensure_member(room_coll, room_id: str, username: str) -> Optional[Roster]:
+    """Put <username> in no_team unless already on a team; None if no such room."""
+    doc = room_coll.find_one_and_update(
+        {"id": room_id, **_not_member(username)},
+        {"$push": {"no_team": username}},
+        projection=_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc:
+        return Roster(doc)
+    return load(room_coll, room_id)      # already listed (or no room)
+
+
+def set_team(room_coll, room_id: str, username: str, team: Optional[str]) -> Optional[Roster]:
+    """Move <username> onto <team> ("red", "blue" or None for no team)."""
+    target = TEAM_FIELDS.get(team, "no_team")
+    # pull from the other two lists and add to the target in one update;
+    # the fields differ, so Mongo applies both atomically
+    others = {field: username for field in TEAM_FIELDS.values() if field != target}
+    doc = room_coll.find_one_and_update(
+        {"id": room_id},
+        {"$pull": others, "$addToSet": {target: username}},
+        projection=_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    return Roster(doc) if doc else None
+
+
+def remove_everywhere(room_coll, username: str):
+    """Pull <username> from every room roster; yields each updated Roster."""
+    member_of = {"$or": [{field: username} for field in TEAM_FIELDS.values()]}
+    pull = {"$pull": {field: username for field in TEAM_FIELDS.values()}}
+    while True:
+        doc = room_coll.find_one_and_update(member_of, pull, projection=_PROJECTION,
+                                            return_document=ReturnDocument.AFTER)
+        if not doc:
+            return
+        yield Roster(doc)
+
+
+def emit_roster(sock, roster: Roster) -> None:
+    sock.emit('roster_update', roster.to_event(), room=roster.room_id, namespace='/lobby')
@@ -3,15 +3,20 @@
 Very small helper that runs two 2-minute rounds, swaps taggers,
 shows a 5-second countdown banner, then declares the winner.
 
-All state is kept in-memory (round_state) plus MongoDB’s players
-list for tagger / team info.
+All state is kept in-memory (round_state) plus the live match state in
+util/room_state for tagger / team info; MongoDB is written behind.
 """
 
 import random, time
-from threading import Timer
 from typing     import Dict
 from flask_socketio import SocketIO
 
+from pymongo import ReturnDocument
+
+from util import (leaderboard, lobby_index, match_log, respawns, room_state, simulation,
+                  user_cache)
+from util.scheduler import scheduler
+
 # ─── Tunables ────────────────────────────────────────────
 ROUND_TIME_SEC = 60          # 2-minute rounds
 PAUSE_BETWEEN  = 5            # 5-second prep banner
@@ -26,71 +31,78 @@ def kick_off_round_system(sock: SocketIO, room_collection, room_id: str) -> None
     first_taggers = random.choice(["red", "blue"])
     round_state[room_id] = {"round": 1, "taggers": first_taggers}
 
-    _flag_taggers_in_db(room_collection, room_id, first_taggers)
+    state = room_state.get_room(room_collection, room_id)
+    if state is not None:
+        match_log.begin(state)
 
     # ✨ Set initial attacking_team immediately
-    room_collection.update_one(
-        {'id': room_id},
-        {'$set': {'attacking_team': first_taggers}}
-    )
+    _flag_taggers(room_collection, room_id, first_taggers)
 
     _start_round(sock, room_id, room_collection)
 
 
-# ─── Internal helpers ───────────────────────────────────
-def _flag_taggers_in_db(room_collection, room_id: str, taggers: str) -> None:
-    """Set players.$[].is_tagger = True / False based on chosen colour."""
-    room = room_collection.find_one({"id": room_id})
-    if not room:
-        return
+def abandon_room(room_collection, room_id: str) -> None:
+    """Everyone left mid-match: drop pending round events and the room."""
+    scheduler.cancel_group(room_id)
+    respawns.drop_room(room_id)
+    match_log.close(room_id)
+    round_state.pop(room_id, None)
+    room_state.drop_room(room_collection, room_id, flush=False)
+    room_collection.delete_one({'id': room_id})
+    lobby_index.remove_room(room_id)
 
-    new_players = []
-    for p in room.get("players", []):
-        p["is_tagger"] = (p.get("team") == taggers)
-        new_players.append(p)
 
-    room_collection.update_one({"id": room_id},
-                               {"$set": {"players": new_players}})
+# ─── Internal helpers ───────────────────────────────────
+def _flag_taggers(room_collection, room_id: str, taggers: str) -> None:
+    """Set attacking_team and each player's is_tagger in the live room state."""
+    if room_state.get_room(room_collection, room_id) is None:
+        return
+    room_state.set_attacking_team(room_id, taggers)
 
 def _start_round(sock: SocketIO, room_id: str, room_collection) -> None:
-    s = round_state[room_id]
-
     # ── 5-second pre-start countdown ────────────────────
     for sec in range(PAUSE_BETWEEN, 0, -1):
-        Timer(PAUSE_BETWEEN - sec,
-              lambda x=sec: sock.emit('round_prep',
-                                       {"seconds": x,
-                                        "next_round": s["round"],
-                                        "taggers":   s["taggers"]},
-                                       room=room_id,
-                                       namespace='/battlefield')).start()
+        scheduler.schedule(PAUSE_BETWEEN - sec, _emit_prep, sock, room_id, sec,
+                           group=room_id)
 
     # ── Real start after PAUSE_BETWEEN seconds ──────────
-    def _fire_start():
-        sock.emit('round_start',
-                  {"round":     s["round"],
-                   "taggers":   s["taggers"],
-                   "duration":  ROUND_TIME_SEC},
-                  room=room_id, namespace='/battlefield')
-        # schedule round end
-        Timer(ROUND_TIME_SEC, _end_round,
-              args=(sock, room_id, room_collection)).start()
+    scheduler.schedule(PAUSE_BETWEEN, _fire_start, sock, room_id, room_collection,
+                       group=room_id)
 
-    Timer(PAUSE_BETWEEN, _fire_start).start()
+def _emit_prep(sock: SocketIO, room_id: str, seconds: int) -> None:
+    s = round_state[room_id]
+    sock.emit('round_prep',
+              {"seconds": seconds,
+               "next_round": s["round"],
+               "taggers":   s["taggers"]},
+              room=room_id,
+              namespace='/battlefield')
+
+def _fire_start(sock: SocketIO, room_id: str, room_collection) -> None:
+    s = round_state[room_id]
+    sock.emit('round_start',
+              {"round":     s["round"],
+               "taggers":   s["taggers"],
+               "duration":  ROUND_TIME_SEC},
+              room=room_id, namespace='/battlefield')
+    # schedule round end
+    scheduler.schedule(ROUND_TIME_SEC, _end_round, sock, room_id, room_collection,
+                       group=room_id)
 
 def _end_round(sock: SocketIO, room_id: str, room_collection) -> None:
     s = round_state[room_id]
 
-    room = room_collection.find_one({'id': room_id}) or {}
-    red  = sum(1 for p in room.get('players', []) if p.get('team') == "red")
-    blue = sum(1 for p in room.get('players', []) if p.get('team') == "blue")
-    winner = "draw"
-    if   red  > blue: winner = "red"
-    elif blue > red:  winner = "blue"
+    state = room_state.get_room(room_collection, room_id)
+    players = list(state.players.values()) if state else []
+    red  = sum(1 for p in players if p.team == "red")
+    blue = sum(1 for p in players if p.team == "blue")
+    winner = simulation.round_winner(red, blue)
 
     sock.emit('round_end',
               {"round": s["round"], "winner": winner},
               room=room_id, namespace='/battlefield')
+    if state:
+        match_log.record_round_end(state, s["round"], winner)
 
     if s["round"] >= MAX_ROUNDS:
         sock.emit('match_over',
@@ -99,28 +111,33 @@ def _end_round(sock: SocketIO, room_id: str, room_collection) -> None:
 
         # ✅ UPDATE USER WINS
         if winner in ["red", "blue"]:
-            winners = [p['id'] for p in room.get('players', []) if p.get('team') == winner]
+            winners = [p.id for p in players if p.team == winner]
+            new_totals = {}
             for uid in winners:
-                room_collection.database['users'].update_one(  # ⚠️ adjust to your actual user collection
+                doc = room_collection.database['users'].find_one_and_update(  # ⚠️ adjust to your actual user collection
                     {"username": uid},
-                    {"$inc": {"wins": 1}}
+                    {"$inc": {"wins": 1}},
+                    projection={"_id": 0, "wins": 1},
+                    return_document=ReturnDocument.AFTER
                 )
+                if doc:
+                    new_totals[uid] = doc.get("wins", 0)
+            user_cache.invalidate(*winners)
+            leaderboard.record_wins(new_totals)
             sock.emit('leaderboard_updated', namespace='/lobby')
 
-        # 🔥 Cleanup room
+        # 🔥 Final flush, then cleanup room
+        respawns.drop_room(room_id)
+        match_log.close(room_id)
+        room_state.drop_room(room_collection, room_id)
         room_collection.delete_one({'id': room_id})
+        lobby_index.remove_room(room_id)
         round_state.pop(room_id, None)
         return
 
     # flip taggers for next round
     s["taggers"] = "blue" if s["taggers"] == "red" else "red"
-    _flag_taggers_in_db(room_collection, room_id, s["taggers"])
-
-    # ✨ sync attacking_team in MongoDB too
-    room_collection.update_one(
-        {'id': room_id},
-        {'$set': {'attacking_team': s["taggers"]}}
-    )
+    _flag_taggers(room_collection, room_id, s["taggers"])
 
     # bump round counter and start next
     s["round"] += 1
@@ -0,0 +1,144 @@
+# util/sampler.py
+"""
+On-demand sampling profiler for a live server (admin-triggered).
+
+Every green thread runs on the eventlet hub's OS thread, so one real
+(unpatched) thread can sample whatever is executing there with
+sys._current_frames(), including a handler that is stalling the hub.
+Nothing runs while no profile is active.
+
+Each sample is attributed to the socket event being handled (read from
+Flask-SocketIO's _handle_event frame) and to the room (the nearest
+`room_id` local, or the event payload's room id), and written as two
+synthetic root frames in front of the stack:
+
+    event:/battlefield move;room:<id>;server.py:...;... 12
+
+That is the collapsed-stack format flamegraph.pl and speedscope read.
+Results go to logs/profile-<time>.folded.
+
+    POST /admin/profiler?seconds=10     start (one at a time)
+    GET  /admin/profiler                status and last output file
+
+Only usernames listed in ADMIN_USERS may use it.
+"""
+
+import os
+import sys
+from collections import Counter
+from typing import Optional, Tuple
+
+from eventlet import patcher
+from flask import Blueprint, g, jsonify, request
+
+_threading = patcher.original('threading')
+_time = patcher.original('time')
+
+# ─── Tunables ────────────────────────────────────────────
+PROFILE_INTERVAL_SEC = float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000
+PROFILE_MAX_SEC = float(os.environ.get('PROFILE_MAX_SEC', 60))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'logs')
+ADMIN_USERS = {u.strip() for u in os.environ.get('ADMIN_USERS', '').split(',') if u.strip()}
+
+MAX_STACK_DEPTH = 128
+
+# ─── In-memory state ────────────────────────────────────
+_state = {'running': False, 'until': 0.0, 'samples': 0, 'last_file': None}
+_lock = _threading.Lock()
+
+
+def start(seconds: float) -> Optional[str]:
+    """Sample the hub thread for <seconds>; None if a profile is already running."""
+    seconds = max(0.1, min(seconds, PROFILE_MAX_SEC))
+    hub_thread = _threading.get_ident()      # called from a handler, i.e. on the hub thread
+    path = os.path.join(PROFILE_DIR, f"profile-{_time.strftime('%Y%m%d-%H%M%S')}.folded")
+    with _lock:
+        if _state['running']:
+            return None
+        _state.update(running=True, until=_time.monotonic() + seconds, samples=0)
+    _threading.Thread(target=_sample, args=(hub_thread, seconds, path),
+                      name='sampler', daemon=True).start()
+    return path
+
+
+def status() -> dict:
+    with _lock:
+        left = max(0.0, _state['until'] - _time.monotonic()) if _state['running'] else 0.0
+        return {'running': _state['running'], 'seconds_left': round(left, 1),
+                'samples': _state['samples'], 'last_file': _state['last_file']}
+
+
+def _sample(hub_thread: int, seconds: float, path: str) -> None:
+    stacks: Counter = Counter()
+    deadline = _time.monotonic() + seconds
+    try:
+        while _time.monotonic() < deadline:
+            frame = sys._current_frames().get(hub_thread)
+            if frame is not None:
+                stacks[_collapse(frame)] += 1
+            del frame
+            _time.sleep(PROFILE_INTERVAL_SEC)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(path, 'w') as out:
+            for stack, count in stacks.most_common():
+                out.write(f"{stack} {count}\n")
+    finally:
+        with _lock:
+            _state.update(running=False, samples=sum(stacks.values()), last_file=path)
+
+
+def _collapse(frame) -> str:
+    """'event:..;room:..;outer;...;inner' for the stack ending at <frame>."""
+    names = []
+    event, room = None, None
+    # the hub waiting for I/O or timers: nothing of ours is running
+    idle = f"{os.sep}hubs{os.sep}" in frame.f_code.co_filename
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        if code.co_name == '_handle_event' and 'flask_socketio' in code.co_filename:
+            event, payload_room = _socket_event(frame)
+            room = room or payload_room
+        elif room is None and 'room_id' in code.co_varnames:
+            value = frame.f_locals.get('room_id')
+            if isinstance(value, str):
+                room = value
+        frame = frame.f_back
+
+    if event is None:
+        event = 'idle' if idle else 'background'
+    names.reverse()
+    return ';'.join([f"event:{event}", f"room:{room or '-'}"] + names)
+
+
+def _socket_event(frame) -> Tuple[str, Optional[str]]:
+    local = frame.f_locals
+    event = f"{local.get('namespace') or '/'} {local.get('message')}"
+    args = local.get('args') or ()
+    data = args[0] if args else None
+    room = None
+    if isinstance(data, dict):
+        room = data.get('room_id') or data.get('roomId')
+    return event, room if isinstance(room, str) else None
+
+
+# Blueprint
+sampler_bp = Blueprint('sampler', __name__)
+
+@sampler_bp.route('/admin/profiler', methods=['GET', 'POST'])
+def profiler():
+    user = getattr(g, 'user', None)
+    if not user or user.get('username') not in ADMIN_USERS:
+        # not abort(): the app-wide exception handler would turn it into a 500
+        return jsonify({'error': 'forbidden'}), 403
+    if request.method == 'GET':
+        return jsonify(status())
+
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return jsonify({'error': 'seconds must be a number'}), 400
+    path = start(seconds)
+    if path is None:
+        return jsonify({'error': 'a profile is already running', **status()}), 409
+    return jsonify({'file': path, 'seconds': min(seconds, PROFILE_MAX_SEC)}), 202
@@ -0,0 +1,110 @@
+# util/scheduler.py
+"""
+One timer heap for every delayed game event in the process.
+
+Round countdowns, round ends and respawns are pushed onto a single heap
+served by one green thread on the eventlet hub, instead of each getting
+its own threading.Timer or sleeping green thread.  Events can be tagged
+with a group (the room id) so an abandoned room can drop everything it
+still has pending in one call.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+import eventlet
+from eventlet.event import Event
+
+# longest the runner sleeps with an empty heap before re-checking
+_IDLE_WAIT_SEC = 60
+
+
+class ScheduledEvent:
+    __slots__ = ('when', 'fn', 'args', 'group', 'cancelled')
+
+    def __init__(self, when, fn, args, group):
+        self.when = when
+        self.fn = fn
+        self.args = args
+        self.group = group
+        self.cancelled = False
+
+
+class Scheduler:
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._groups: Dict[Hashable, set] = {}
+        self._wakeup = Event()
+        self._runner = None
+
+    def schedule(self, delay: float, fn: Callable, *args,
+                 group: Optional[Hashable] = None) -> ScheduledEvent:
+        """Run fn(*args) after <delay> seconds."""
+        ev = ScheduledEvent(time.monotonic() + delay, fn, args, group)
+        first = not self._heap or ev.when < self._heap[0][0]
+        heapq.heappush(self._heap, (ev.when, next(self._seq), ev))
+        if group is not None:
+            self._groups.setdefault(group, set()).add(ev)
+
+        if self._runner is None:
+            self._runner = eventlet.spawn(self._run)
+        elif first:
+            self._wake()
+        return ev
+
+    def cancel(self, ev: ScheduledEvent) -> None:
+        # lazily removed: the runner skips it when it reaches the top
+        ev.cancelled = True
+        self._forget(ev)
+
+    def cancel_group(self, group: Hashable) -> int:
+        """Cancel every pending event of <group>; returns how many were dropped."""
+        events = self._groups.pop(group, set())
+        for ev in events:
+            ev.cancelled = True
+        return len(events)
+
+    def backlog(self) -> int:
+        """Pending, not-cancelled events."""
+        return sum(1 for _, _, ev in self._heap if not ev.cancelled)
+
+    def _forget(self, ev: ScheduledEvent) -> None:
+        if ev.group is None:
+            return
+        events = self._groups.get(ev.group)
+        if events is not None:
+            events.discard(ev)
+            if not events:
+                del self._groups[ev.group]
+
+    def _wake(self) -> None:
+        if not self._wakeup.ready():
+            self._wakeup.send()
+
+    def _run(self) -> None:
+        heap = self._heap
+        while True:
+            now = time.monotonic()
+            while heap and (heap[0][2].cancelled or heap[0][0] <= now):
+                _, _, ev = heapq.heappop(heap)
+                if ev.cancelled:
+                    continue
+                self._forget(ev)
+                try:
+                    ev.fn(*ev.args)
+                except Exception:
+                    logging.exception(f"Scheduled event {getattr(ev.fn, '__name__', ev.fn)} failed")
+                now = time.monotonic()
+
+            delay = heap[0][0] - now if heap else _IDLE_WAIT_SEC
+            self._wakeup = Event()
+            with eventlet.Timeout(max(delay, 0), False):
+                self._wakeup.wait()
+
+
+# process-wide instance
+scheduler = Scheduler()
@@ -0,0 +1,130 @@
+# util/simulation.py
+"""
+Battlefield rules without any I/O: applying a tick's inputs, tagging and
+respawning.
+
+The live server (util/battlefield.py, util/respawns.py) wraps these with
+emits and Mongo writes; tools/replay.py runs recorded match logs through
+the very same functions, so a replay follows exactly the rules the
+server ran.  Everything here is deterministic for a given RoomState and
+input order.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from util.collision import CollisionMask, key_direction, team_index
+from util.terrain import MAP_HEIGHT, MAP_WIDTH
+from util.ticker import MOVE_STEP, Input
+
+_default_collision = None
+
+
+def collision_for(state) -> CollisionMask:
+    """The room's mask; rooms stored without terrain get an open MAP_WIDTH x MAP_HEIGHT field."""
+    global _default_collision
+    if state.collision is not None:
+        return state.collision
+    if _default_collision is None:
+        _default_collision = CollisionMask([[0] * MAP_WIDTH for _ in range(MAP_HEIGHT)])
+    return _default_collision
+
+
+def apply_inputs(state, inputs: Dict[str, List[Input]]) -> Tuple[Dict, Dict]:
+    """
+    Apply one tick of queued inputs (one MOVE_STEP each).
+
+    Returns (moved, acked): records that changed position, and records
+    whose input seq was applied, dead players and blocked moves included.
+    """
+    collision = collision_for(state)
+
+    queued, acked = [], {}
+    for player, player_inputs in inputs.items():
+        record = state.players.get(player)
+        if not record:
+            continue
+        if record.alive:
+            queued.append((record, player_inputs))
+        elif player_inputs[-1][0] is not None:
+            # dead players don't move, but their inputs still count as applied
+            record.last_seq = player_inputs[-1][0]
+            acked[record.id] = record
+
+    # one batched pass per input slot over every live player that still
+    # has an input left in that slot
+    moved = {}
+    for slot in range(max((len(q) for _, q in queued), default=0)):
+        records, dxs, dys, seqs = [], [], [], []
+        for record, player_inputs in queued:
+            if slot < len(player_inputs):
+                seq, keyPress = player_inputs[slot]
+                dx, dy = key_direction(keyPress)
+                records.append(record)
+                dxs.append(dx)
+                dys.append(dy)
+                seqs.append(seq)
+
+        new_xs, new_ys, ok = collision.resolve_batch(
+            [r.x for r in records], [r.y for r in records], dxs, dys,
+            [team_index(r.team) for r in records], MOVE_STEP)
+
+        for record, new_x, new_y, accepted, seq in zip(records, new_xs, new_ys, ok, seqs):
+            if seq is not None:
+                record.last_seq = seq
+                acked[record.id] = record
+            if not accepted:
+                continue
+            state.move_player(record, new_x, new_y)
+            moved[record.id] = record
+    return moved, acked
+
+
+def check_tag(state, mover) -> Optional[Tuple[object, object]]:
+    """
+    Tag at most one opponent within a tile of <mover>; returns (victim, tagger).
+
+    Candidates are tried in player-index order so the outcome does not
+    depend on set iteration order.
+    """
+    attacking_team = state.attacking_team
+    # only the 3x3 cells around the mover can hold someone within one tile
+    for other in sorted(state.nearby(mover), key=lambda p: p.idx):
+        if mover.team == other.team:
+            continue
+
+        if mover.team == attacking_team:
+            victim, tagger = other, mover
+        elif other.team == attacking_team:
+            victim, tagger = mover, other
+        else:
+            continue
+
+        if not victim.alive:
+            continue
+        victim.alive = False
+        victim.tagger = tagger.id
+        return victim, tagger
+    return None
+
+
+def respawn(state, player: str):
+    """Bring dead <player> back on its tagger's team; the record, or None if nothing changed."""
+    record = state.players.get(player)
+    if not record or record.alive:
+        return None
+    tagger = state.players.get(record.tagger)
+    if tagger:
+        record.team = tagger.team
+        record.dirty = True
+    record.alive = True
+    record.tagger = None
+    return record
+
+
+def round_winner(red: int, blue: int) -> str:
+    """The team with more players when the round clock runs out."""
+    if red > blue:
+        return "red"
+    if blue > red:
+        return "blue"
+    return "draw"
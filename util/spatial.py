@@ -0,0 +1,61 @@
+# util/spatial.py
+"""
+Uniform-grid spatial hash for proximity queries on the battlefield.
+
+Keys (player names) are bucketed by the tile cell they stand in and
+moved between buckets incrementally, so "who is within one tile of me"
+only has to look at the 3x3 block of cells around the asker instead of
+every player in the room.
+"""
+
+from typing import Dict, Hashable, Iterator, Set, Tuple
+
+Cell = Tuple[int, int]
+
+
+class SpatialHash:
+    __slots__ = ('cell_size', 'cells', 'where')
+
+    def __init__(self, cell_size: float = 1.0):
+        self.cell_size = cell_size
+        self.cells: Dict[Cell, Set[Hashable]] = {}
+        self.where: Dict[Hashable, Cell] = {}
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, key: Hashable, x: float, y: float) -> None:
+        cell = self._cell(x, y)
+        self.where[key] = cell
+        self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        cell = self.where.pop(key, None)
+        if cell is None:
+            return
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[cell]
+
+    def move(self, key: Hashable, x: float, y: float) -> None:
+        """Re-bucket <key> at (x, y); a no-op while it stays in the same cell."""
+        cell = self._cell(x, y)
+        old = self.where.get(key)
+        if old == cell:
+            return
+        if old is not None:
+            self.remove(key)
+        self.where[key] = cell
+        self.cells.setdefault(cell, set()).add(key)
+
+    def neighbours(self, x: float, y: float) -> Iterator[Hashable]:
+        """Every key in the 3x3 block of cells around (x, y), the centre included."""
+        cx, cy = self._cell(x, y)
+        cells = self.cells
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                bucket = cells.get((cx + dx, cy + dy))
+                if bucket:
+                    yield from bucket
@@ -0,0 +1,206 @@
+# util/terrain.py
+"""
+Chunked, procedurally generated battlefield terrain.
+
+A map is width × height tiles cut into CHUNK_SIZE × CHUNK_SIZE chunks.
+Each chunk is generated on first use from (seed, cx, cy) alone, so any
+chunk can be rebuilt without its neighbours and a room document only has
+to store {"seed", "version", "width", "height"}.  `version` picks the
+generator, so changing the generator never reshapes existing maps.
+Maps that weren't generated (rooms stored with a full grid) are kept as
+a zlib-packed tile blob instead.  Chunks are row-major `bytes`, one tile
+per byte (0 floor, 1 wall, 2 blue safe zone, 3 red safe zone); edge
+chunks are cut to the map size.
+
+Clients get the map size on join and fetch chunks near them as they
+move (`get_chunks` → `terrain_chunk`), so join cost and client memory
+don't grow with the map.
+"""
+
+import os
+import random
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ─── Tunables ────────────────────────────────────────────
+CHUNK_SIZE = 32
+MAP_WIDTH = int(os.environ.get('MAP_WIDTH', 30))           # size of newly created maps
+MAP_HEIGHT = int(os.environ.get('MAP_HEIGHT', 20))
+MAX_MAP_SIDE = 4096
+GENERATOR_VERSION = 1    # bump when _GENERATORS gets a new entry
+
+# generator density, per tile (the original 30x20 map had 5 blocks, 20 obstacles)
+WALL_BLOCKS_PER_TILE = 5 / 600
+OBSTACLES_PER_TILE = 20 / 600
+
+FLOOR, WALL, BLUE_SAFE, RED_SAFE = 0, 1, 2, 3
+SAFE_ZONE = 2            # safe zones are SAFE_ZONE × SAFE_ZONE tiles in opposite corners
+
+ChunkKey = Tuple[int, int]
+
+
+class Terrain:
+    __slots__ = ('width', 'height', 'seed', 'version', 'chunks')
+
+    def __init__(self, width: int, height: int, seed: Optional[int],
+                 chunks: Optional[Dict[ChunkKey, bytes]] = None,
+                 version: int = GENERATOR_VERSION):
+        if seed is not None and version not in _GENERATORS:
+            raise ValueError(f"unknown terrain generator version {version}")
+        self.width = width
+        self.height = height
+        self.seed = seed            # None: every chunk is given, nothing is generated
+        self.version = version
+        self.chunks: Dict[ChunkKey, bytes] = chunks or {}
+
+    # ─── construction ───────────────────────────────────
+    @classmethod
+    def generate(cls, width: int = MAP_WIDTH, height: int = MAP_HEIGHT,
+                 seed: Optional[int] = None) -> "Terrain":
+        width = max(SAFE_ZONE * 2, min(width, MAX_MAP_SIDE))
+        height = max(SAFE_ZONE * 2, min(height, MAX_MAP_SIDE))
+        if seed is None:
+            seed = random.getrandbits(31)
+        return cls(width, height, seed)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[int]]) -> "Terrain":
+        """Wrap a full list-of-lists grid (rooms stored before chunking)."""
+        height = len(rows)
+        width = len(rows[0]) if height else 0
+        return cls.from_tiles(width, height, bytes(tile for row in rows for tile in row))
+
+    @classmethod
+    def from_tiles(cls, width: int, height: int, tiles: bytes) -> "Terrain":
+        """Cut a row-major width × height tile buffer into chunks."""
+        terrain = cls(width, height, None)
+        for cy in range(terrain.chunk_rows):
+            for cx in range(terrain.chunk_cols):
+                x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+                cw, ch = terrain.chunk_dims(cx, cy)
+                terrain.chunks[(cx, cy)] = b"".join(
+                    tiles[y * width + x0:y * width + x0 + cw] for y in range(y0, y0 + ch))
+        return terrain
+
+    def spec(self) -> dict:
+        """What a room document stores to rebuild this map."""
+        if self.seed is None:
+            return {"width": self.width, "height": self.height,
+                    "tiles": zlib.compress(self.tiles(), 9)}
+        return {"seed": self.seed, "version": self.version,
+                "width": self.width, "height": self.height}
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "Terrain":
+        if "tiles" in spec:
+            return cls.from_tiles(spec["width"], spec["height"], zlib.decompress(spec["tiles"]))
+        return cls(spec["width"], spec["height"], spec["seed"], version=spec.get("version", 1))
+
+    # ─── chunks ─────────────────────────────────────────
+    @property
+    def chunk_cols(self) -> int:
+        return -(-self.width // CHUNK_SIZE)
+
+    @property
+    def chunk_rows(self) -> int:
+        return -(-self.height // CHUNK_SIZE)
+
+    def has_chunk(self, cx: int, cy: int) -> bool:
+        return 0 <= cx < self.chunk_cols and 0 <= cy < self.chunk_rows
+
+    def chunk_dims(self, cx: int, cy: int) -> Tuple[int, int]:
+        return (min(CHUNK_SIZE, self.width - cx * CHUNK_SIZE),
+                min(CHUNK_SIZE, self.height - cy * CHUNK_SIZE))
+
+    def chunk(self, cx: int, cy: int) -> bytes:
+        tiles = self.chunks.get((cx, cy))
+        if tiles is None:
+            tiles = self.chunks[(cx, cy)] = _GENERATORS[self.version](self, cx, cy)
+        return tiles
+
+    def tiles(self) -> bytes:
+        """The whole map as one row-major buffer."""
+        rows = []
+        for y in range(self.height):
+            cy, ry = divmod(y, CHUNK_SIZE)
+            for cx in range(self.chunk_cols):
+                cw, _ = self.chunk_dims(cx, cy)
+                rows.append(self.chunk(cx, cy)[ry * cw:(ry + 1) * cw])
+        return b"".join(rows)
+
+    def tile(self, x: int, y: int) -> int:
+        cx, cy = x // CHUNK_SIZE, y // CHUNK_SIZE
+        cw, _ = self.chunk_dims(cx, cy)
+        return self.chunk(cx, cy)[(y % CHUNK_SIZE) * cw + x % CHUNK_SIZE]
+
+    def to_rows(self) -> List[List[int]]:
+        """Full list-of-lists grid; only sensible for small maps."""
+        return [[self.tile(x, y) for x in range(self.width)] for y in range(self.height)]
+
+    def spawn_point(self, team: Optional[str]) -> Tuple[int, int]:
+        """Inside the team's own safe zone: red top-left, blue bottom-right."""
+        if team == "blue":
+            return self.width - 1, self.height - 1
+        return 1, 1
+
+
+def _safe_tile(terrain: Terrain, x: int, y: int) -> int:
+    if x < SAFE_ZONE and y < SAFE_ZONE:
+        return RED_SAFE
+    if x >= terrain.width - SAFE_ZONE and y >= terrain.height - SAFE_ZONE:
+        return BLUE_SAFE
+    return FLOOR
+
+
+def _generate_chunk(terrain: Terrain, cx: int, cy: int) -> bytes:
+    """Walls and obstacles for one chunk, from (seed, cx, cy) only."""
+    x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+    cw, ch = terrain.chunk_dims(cx, cy)
+    tiles = bytearray(cw * ch)
+    rng = random.Random(f"{terrain.seed}:{cx}:{cy}")
+    area = cw * ch
+
+    def place_wall(x, y):
+        if _safe_tile(terrain, x0 + x, y0 + y) == FLOOR:
+            tiles[y * cw + x] = WALL
+
+    # medium-sized wall blocks, kept inside the chunk
+    for _ in range(round(area * WALL_BLOCKS_PER_TILE)):
+        bw, bh = rng.randint(1, 2), rng.randint(1, 2)
+        sx = rng.randint(0, max(cw - bw, 0))
+        sy = rng.randint(0, max(ch - bh, 0))
+        for y in range(sy, min(sy + bh, ch)):
+            for x in range(sx, min(sx + bw, cw)):
+                place_wall(x, y)
+
+    # small scattered obstacles
+    for _ in range(round(area * OBSTACLES_PER_TILE)):
+        place_wall(rng.randrange(cw), rng.randrange(ch))
+
+    # safe zones: only the corner chunks hold any of their tiles
+    for zx, zy in _safe_zone_tiles(terrain):
+        if x0 <= zx < x0 + cw and y0 <= zy < y0 + ch:
+            tiles[(zy - y0) * cw + zx - x0] = _safe_tile(terrain, zx, zy)
+    return bytes(tiles)
+
+
+def _safe_zone_tiles(terrain: Terrain):
+    for y in range(SAFE_ZONE):
+        for x in range(SAFE_ZONE):
+            yield x, y
+            yield terrain.width - 1 - x, terrain.height - 1 - y
+
+
+# generator version → chunk generator; old entries stay so old seeds keep their maps
+_GENERATORS = {1: _generate_chunk}
+
+
+def from_doc(doc: dict) -> Optional[Terrain]:
+    """Terrain of a room document: a map spec, or a legacy full grid."""
+    spec = doc.get('map')
+    if spec:
+        return Terrain.from_spec(spec)
+    rows = doc.get('terrain')
+    if rows:
+        return Terrain.from_rows(rows)
+    return None
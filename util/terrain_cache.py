@@ -0,0 +1,64 @@
+# util/terrain_cache.py
+"""
+Process-wide LRU cache of compiled terrains (Terrain + CollisionMask).
+
+Maps are keyed by what describes them: (seed, generator version, size)
+for generated maps, a digest of the packed tiles for stored ones.
+Rooms that share a map, and every reload of the same room, reuse one
+compiled copy instead of regenerating chunks and rebuilding the
+collision masks.  Entries in use by a live room stay alive through the
+RoomState even after eviction.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from eventlet.semaphore import Semaphore
+
+from util.collision import CollisionMask
+from util.terrain import Terrain, from_doc
+
+# ─── Tunables ────────────────────────────────────────────
+TERRAIN_CACHE_MAX = int(os.environ.get('TERRAIN_CACHE_MAX', 16))
+
+Compiled = Tuple[Terrain, CollisionMask]
+
+# ─── In-memory cache:  key → (Terrain, CollisionMask) ───
+_cache: "OrderedDict[tuple, Compiled]" = OrderedDict()
+counters = {'hits': 0, 'misses': 0}
+_lock = Semaphore()
+
+
+def _key(spec: dict) -> tuple:
+    if 'tiles' in spec:
+        return ('tiles', spec['width'], spec['height'], hashlib.sha1(spec['tiles']).digest())
+    return ('seed', spec['seed'], spec.get('version', 1), spec['width'], spec['height'])
+
+
+def for_room(doc: dict) -> Tuple[Optional[Terrain], Optional[CollisionMask]]:
+    """Compiled terrain of room <doc>, or (None, None) if it has none."""
+    spec = doc.get('map')
+    if not spec:
+        # legacy full grid: compile it uncached (load_room migrates these)
+        terrain = from_doc(doc)
+        return (terrain, CollisionMask(terrain)) if terrain else (None, None)
+
+    key = _key(spec)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            counters['hits'] += 1
+            return entry
+        counters['misses'] += 1
+
+    terrain = Terrain.from_spec(spec)
+    entry = (terrain, CollisionMask(terrain))
+    with _lock:
+        _cache[key] = entry
+        _cache.move_to_end(key)
+        while len(_cache) > TERRAIN_CACHE_MAX:
+            _cache.popitem(last=False)
+    return entry
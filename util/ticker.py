@@ -0,0 +1,133 @@
+# util/ticker.py
+"""
+Fixed-rate simulation loop, one green thread per battlefield room.
+
+`move` events only queue the player's key state, tagged with the
+client's input sequence number.  The room's ticker wakes TICK_RATE times
+a second, hands the queued inputs to the tick function and sleeps until
+the next tick, so server work depends on the number of players, not on
+how often clients send input.
+
+Every input is one MOVE_STEP, which lets predicting clients replay the
+inputs the server has not acknowledged yet.  Each player earns one step
+per tick and may bank up to INPUTS_PER_TICK, so inputs bunched up by
+network jitter are caught up on but nobody moves faster than MOVE_SPEED.
+"""
+
+import os
+import time
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from eventlet import sleep
+from eventlet.semaphore import Semaphore
+
+# ─── Tunables ────────────────────────────────────────────
+TICK_RATE = int(os.environ.get('TICK_RATE', 20))           # ticks per second
+MOVE_SPEED = float(os.environ.get('MOVE_SPEED', 6.0))      # tiles per second
+IDLE_TIMEOUT_SEC = 30        # stop a room's loop after this long without input
+INPUTS_PER_TICK = int(os.environ.get('INPUTS_PER_TICK', 3))  # catch-up burst
+
+TICK_INTERVAL = 1.0 / TICK_RATE
+MOVE_STEP = MOVE_SPEED / TICK_RATE                         # tiles per tick
+INPUT_BACKLOG = TICK_RATE    # queued inputs kept per player; older ones are dropped
+
+Input = Tuple[Optional[int], dict]                         # (seq, keyState)
+
+# ─── In-memory state ────────────────────────────────────
+pending_inputs: Dict[str, Dict[str, Deque[Input]]] = {}   # { room_id: { player: inputs } }
+running_rooms = set()
+_lock = Semaphore()
+
+
+def buffer_input(room_id: str, player: str, keys: dict, seq: Optional[int] = None) -> bool:
+    """
+    Queue <keys> (client input number <seq>) as one step for <player>.
+
+    Inputs without a seq come from clients that don't replay, so a new
+    one replaces a still-queued one instead of adding a step; returns
+    True when that happened.
+    """
+    with _lock:
+        queue = pending_inputs.setdefault(room_id, {}).get(player)
+        if queue is None:
+            queue = pending_inputs[room_id][player] = deque(maxlen=INPUT_BACKLOG)
+        if seq is None and queue and queue[-1][0] is None:
+            queue[-1] = (seq, keys)
+            return True
+        queue.append((seq, keys))
+        return False
+
+
+def ensure_room_ticker(sock, room_id: str,
+                       tick_fn: Callable[[str, Dict[str, List[Input]]], bool]) -> None:
+    """
+    Start the loop for <room_id> unless it is already running.
+
+    tick_fn(room_id, inputs) is called once per tick with
+    {player: [(seq, keys), ...]} in arrival order, at most as many inputs
+    per player as their step allowance; returning False stops the loop
+    (e.g. room deleted).
+    """
+    with _lock:
+        if room_id in running_rooms:
+            return
+        running_rooms.add(room_id)
+    sock.start_background_task(_run, room_id, tick_fn)
+
+
+def _take_inputs(room_id: str, credit: Dict[str, int]) -> Tuple[Dict[str, List[Input]], bool]:
+    """Pop each player's allowance of queued inputs; also report whether any were queued."""
+    taken = {}
+    with _lock:
+        queues = pending_inputs.get(room_id) or {}
+        for player in queues:
+            credit.setdefault(player, 0)
+        # everyone earns a step per tick, queued input or not
+        for player, steps in credit.items():
+            credit[player] = min(steps + 1, INPUTS_PER_TICK)
+        if not queues:
+            return taken, False
+        for player, queue in list(queues.items()):
+            n = min(credit[player], len(queue))
+            credit[player] -= n
+            if n:
+                taken[player] = [queue.popleft() for _ in range(n)]
+            if not queue:
+                del queues[player]
+        if not queues:
+            del pending_inputs[room_id]
+    return taken, True
+
+
+def _run(room_id: str, tick_fn) -> None:
+    idle_ticks = 0
+    max_idle_ticks = IDLE_TIMEOUT_SEC * TICK_RATE
+    credit: Dict[str, int] = {}      # banked steps per player
+    next_tick = time.monotonic()
+    try:
+        while True:
+            inputs, queued = _take_inputs(room_id, credit)
+
+            idle_ticks = 0 if queued else idle_ticks + 1
+            if idle_ticks > max_idle_ticks:
+                break
+
+            try:
+                if tick_fn(room_id, inputs) is False:
+                    break
+            except Exception:
+                logging.exception(f"Tick failed for room {room_id}")
+
+            next_tick += TICK_INTERVAL
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # fell behind: drop the missed ticks instead of bursting
+                next_tick = time.monotonic()
+                delay = 0
+            sleep(delay)
+    finally:
+        with _lock:
+            running_rooms.discard(room_id)
+            pending_inputs.pop(room_id, None)
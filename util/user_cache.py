@@ -0,0 +1,72 @@
+# util/user_cache.py
+"""
+Process-wide cache of the user profile fields needed to render players
+(username, avatar, wins), with TTL expiry and LRU eviction.
+
+Misses are fetched in one `$in` query, so resolving the avatars of a
+whole room costs at most one Mongo round trip.  Anything that writes
+those fields (avatar upload, win updates) must call invalidate().
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from eventlet.semaphore import Semaphore
+
+# ─── Tunables ────────────────────────────────────────────
+USER_CACHE_TTL_SEC = float(os.environ.get('USER_CACHE_TTL', 60))
+USER_CACHE_MAX = int(os.environ.get('USER_CACHE_MAX', 10000))
+
+PROFILE_FIELDS = {'_id': 0, 'username': 1, 'avatar': 1, 'wins': 1}
+
+# ─── In-memory cache:  username → (expires_at, profile) ──
+_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_lock = Semaphore()
+
+
+def get_users(user_coll, usernames: Iterable[str]) -> Dict[str, dict]:
+    """
+    Profiles for <usernames> as {username: doc}.  Unknown users map to {}
+    so callers can treat every name the same way.
+    """
+    now = time.monotonic()
+    found: Dict[str, dict] = {}
+    missing = []
+
+    with _lock:
+        for name in usernames:
+            if name in found:
+                continue
+            entry = _cache.get(name)
+            if entry and entry[0] > now:
+                _cache.move_to_end(name)
+                found[name] = entry[1]
+            else:
+                missing.append(name)
+
+    if missing:
+        fetched = {d['username']: d
+                   for d in user_coll.find({'username': {'$in': missing}}, PROFILE_FIELDS)}
+        expires = now + USER_CACHE_TTL_SEC
+        with _lock:
+            for name in missing:
+                doc = fetched.get(name, {})
+                _cache[name] = (expires, doc)
+                _cache.move_to_end(name)
+                found[name] = doc
+            while len(_cache) > USER_CACHE_MAX:
+                _cache.popitem(last=False)
+
+    return found
+
+
+def get_user(user_coll, username: str) -> dict:
+    return get_users(user_coll, [username])[username]
+
+
+def invalidate(*usernames: str) -> None:
+    with _lock:
+        for name in usernames:
+            _cache.pop(name, None)